@@ -3,15 +3,22 @@ import os
 import sys
 from pathlib import Path
 from modules import script_callbacks, extra_networks, prompt_parser
-from fastapi import FastAPI, Body, Request, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, Depends, Body, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from scripts.physton_prompt.storage import Storage
 from scripts.physton_prompt.get_extensions import get_extensions
 from scripts.physton_prompt.get_token_counter import get_token_counter
 from scripts.physton_prompt.get_i18n import get_i18n
 from scripts.physton_prompt.get_translate_apis import get_translate_apis, privacy_translate_api_config, unprotected_translate_api_config
 from scripts.physton_prompt.translate import translate
+from scripts.physton_prompt.translator_registry import translator_registry
+from scripts.physton_prompt.translate_cache import translate_cache
+from scripts.physton_prompt.translate_dictionary import translate_dictionary
+from scripts.physton_prompt.translate_warm_up import TranslateWarmUp, translate_warm_up
+from scripts.physton_prompt.translate_memory import get_translate_memory
 from scripts.physton_prompt.history import History
+from scripts.physton_prompt.history_transfer import export_lines, HistoryImporter
 from scripts.physton_prompt.csv import get_csvs, get_csv
 from scripts.physton_prompt.styles import get_style_full_path, get_extension_css_list
 from scripts.physton_prompt.get_extra_networks import get_extra_networks
@@ -57,22 +64,32 @@ except Exception as e:
 
 
 def on_app_started(_: gr.Blocks, app: FastAPI):
-    hi = History()
+    # 多用户部署时由反向代理通过请求头或 cookie 传入用户的命名空间，每个命名空间的数据单独存储
+    namespace_header = os.environ.get('PHYSTON_PROMPT_NAMESPACE_HEADER', 'X-Physton-Prompt-Namespace')
+    namespace_cookie = os.environ.get('PHYSTON_PROMPT_NAMESPACE_COOKIE', 'physton_prompt_namespace')
 
-    @app.get("/physton_prompt/get_version")
+    async def resolve_namespace(request: Request):
+        namespace = request.headers.get(namespace_header, '') or request.cookies.get(namespace_cookie, '')
+        Storage.set_namespace(namespace.strip())
+
+    router = APIRouter(dependencies=[Depends(resolve_namespace)])
+    # 历史记录在后台加载，不阻塞启动
+    History.get_instance('').warm_up()
+
+    @router.get("/physton_prompt/get_version")
     async def _get_version():
         return {
             'version': get_git_commit_version(),
             'latest_version': get_latest_version(),
         }
 
-    @app.get("/physton_prompt/get_remote_versions")
+    @router.get("/physton_prompt/get_remote_versions")
     async def _get_remote_versions(page: int = 1, per_page: int = 100):
         return {
             'versions': get_git_remote_versions(page, per_page),
         }
 
-    @app.get("/physton_prompt/get_config")
+    @router.get("/physton_prompt/get_config")
     async def _get_config():
         return {
             'i18n': get_i18n(True),
@@ -81,7 +98,7 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             'python': sys.executable,
         }
 
-    @app.post("/physton_prompt/install_package")
+    @router.post("/physton_prompt/install_package")
     async def _install_package(request: Request):
         try:
             data = await request.json()
@@ -93,11 +110,11 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"result": get_lang('is_required', {'0': 'package'})}
         return {"result": install_package(data['name'], data['package'])}
 
-    @app.get("/physton_prompt/get_extensions")
+    @router.get("/physton_prompt/get_extensions")
     async def _get_extensions():
         return {"extends": get_extensions()}
 
-    @app.post("/physton_prompt/token_counter")
+    @router.post("/physton_prompt/token_counter")
     async def _token_counter(request: Request):
         data = await request.json()
         if 'text' not in data:
@@ -106,22 +123,21 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"result": get_lang('is_required', {'0': 'steps'})}
         return get_token_counter(data['text'], data['steps'])
 
-    @app.get("/physton_prompt/get_data")
+    @router.get("/physton_prompt/get_data")
     async def _get_data(key: str):
         data = Storage.get(key)
         data = privacy_translate_api_config(key, data)
         return {"data": data}
 
-    @app.get("/physton_prompt/get_datas")
+    @router.get("/physton_prompt/get_datas")
     async def _get_datas(keys: str):
         keys = keys.split(',')
-        datas = {}
-        for key in keys:
-            datas[key] = Storage.get(key)
+        datas = Storage.get_many(keys)
+        for key in datas:
             datas[key] = privacy_translate_api_config(key, datas[key])
         return {"datas": datas}
 
-    @app.post("/physton_prompt/set_data")
+    @router.post("/physton_prompt/set_data")
     async def _set_data(request: Request):
         data = await request.json()
         if 'key' not in data:
@@ -130,23 +146,26 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'data'})}
         data['data'] = unprotected_translate_api_config(data['key'], data['data'])
         Storage.set(data['key'], data['data'])
+        translator_registry.invalidate_config(data['key'])
         return {"success": True}
 
-    @app.post("/physton_prompt/set_datas")
+    @router.post("/physton_prompt/set_datas")
     async def _set_datas(request: Request):
         data = await request.json()
         if not isinstance(data, dict):
             return {"success": False, "message": get_lang('is_not_dict', {'0': 'data'})}
         for key in data:
             data[key] = unprotected_translate_api_config(key, data[key])
-            Storage.set(key, data[key])
+        Storage.set_many(data)
+        for key in data:
+            translator_registry.invalidate_config(key)
         return {"success": True}
 
-    @app.get("/physton_prompt/get_data_list_item")
+    @router.get("/physton_prompt/get_data_list_item")
     async def _get_data_list_item(key: str, index: int):
         return {"item": Storage.list_get(key, index)}
 
-    @app.post("/physton_prompt/push_data_list")
+    @router.post("/physton_prompt/push_data_list")
     async def _push_data_list(request: Request):
         data = await request.json()
         if 'key' not in data:
@@ -156,21 +175,21 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
         Storage.list_push(data['key'], data['item'])
         return {"success": True}
 
-    @app.post("/physton_prompt/pop_data_list")
+    @router.post("/physton_prompt/pop_data_list")
     async def _pop_data_list(request: Request):
         data = await request.json()
         if 'key' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'key'})}
         return {"success": True, 'item': Storage.list_pop(data['key'])}
 
-    @app.post("/physton_prompt/shift_data_list")
+    @router.post("/physton_prompt/shift_data_list")
     async def _shift_data_list(request: Request):
         data = await request.json()
         if 'key' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'key'})}
         return {"success": True, 'item': Storage.list_shift(data['key'])}
 
-    @app.post("/physton_prompt/remove_data_list")
+    @router.post("/physton_prompt/remove_data_list")
     async def _remove_data_list(request: Request):
         data = await request.json()
         if 'key' not in data:
@@ -180,7 +199,7 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
         Storage.list_remove(data['key'], data['index'])
         return {"success": True}
 
-    @app.post("/physton_prompt/clear_data_list")
+    @router.post("/physton_prompt/clear_data_list")
     async def _clear_data_list(request: Request):
         data = await request.json()
         if 'key' not in data:
@@ -188,15 +207,49 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
         Storage.list_clear(data['key'])
         return {"success": True}
 
-    @app.get("/physton_prompt/get_histories")
-    async def _get_histories(type: str):
-        return {"histories": hi.get_histories(type)}
-
-    @app.get("/physton_prompt/get_favorites")
-    async def _get_favorites(type: str):
-        return {"favorites": hi.get_favorites(type)}
-
-    @app.post("/physton_prompt/push_history")
+    def parse_fields(fields):
+        if not fields:
+            return None
+        return [field.strip() for field in fields.split(',') if field.strip()]
+
+    @router.get("/physton_prompt/get_history_status")
+    async def _get_history_status():
+        status = History.get_instance().get_status()
+        ready = all(item['histories'] and item['favorites'] for item in status.values())
+        return {"ready": ready, "types": status}
+
+    # 传入 limit 时分页返回（从最新的开始），fields 只返回指定的字段，例如 id,name,prompt,time
+    @router.get("/physton_prompt/get_histories")
+    async def _get_histories(type: str, limit: int = None, cursor: str = None, fields: str = None):
+        if limit is None:
+            return {"histories": History.get_instance().get_histories(type, parse_fields(fields))}
+        histories, next_cursor = History.get_instance().get_histories_page(type, limit, cursor, parse_fields(fields))
+        return {"histories": histories, "next_cursor": next_cursor}
+
+    @router.get("/physton_prompt/get_history")
+    async def _get_history(type: str, id: str):
+        return {"history": History.get_instance().get_history(type, id)}
+
+    @router.get("/physton_prompt/get_favorites")
+    async def _get_favorites(type: str, limit: int = None, cursor: str = None, fields: str = None):
+        if limit is None:
+            return {"favorites": History.get_instance().get_favorites(type, parse_fields(fields))}
+        favorites, next_cursor = History.get_instance().get_favorites_page(type, limit, cursor, parse_fields(fields))
+        return {"favorites": favorites, "next_cursor": next_cursor}
+
+    @router.get("/physton_prompt/get_favorite")
+    async def _get_favorite(type: str, id: str):
+        return {"favorite": History.get_instance().get_favorite(type, id)}
+
+    @router.get("/physton_prompt/search_histories")
+    async def _search_histories(type: str, q: str, limit: int = 20, fields: str = None):
+        return {"histories": History.get_instance().search_histories(type, q, limit, parse_fields(fields))}
+
+    @router.get("/physton_prompt/search_favorites")
+    async def _search_favorites(type: str, q: str, limit: int = 20, fields: str = None):
+        return {"favorites": History.get_instance().search_favorites(type, q, limit, parse_fields(fields))}
+
+    @router.post("/physton_prompt/push_history")
     async def _push_history(request: Request):
         data = await request.json()
         if 'type' not in data:
@@ -205,10 +258,10 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'tags'})}
         if 'prompt' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'prompt'})}
-        hi.push_history(data['type'], data['tags'], data['prompt'], data.get('name', ''))
+        History.get_instance().push_history(data['type'], data['tags'], data['prompt'], data.get('name', ''), data.get('dedup', None))
         return {"success": True}
 
-    @app.post("/physton_prompt/push_favorite")
+    @router.post("/physton_prompt/push_favorite")
     async def _push_favorite(request: Request):
         data = await request.json()
         if 'type' not in data:
@@ -217,32 +270,45 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'tags'})}
         if 'prompt' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'prompt'})}
-        hi.push_favorite(data['type'], data['tags'], data['prompt'], data.get('name', ''))
+        History.get_instance().push_favorite(data['type'], data['tags'], data['prompt'], data.get('name', ''))
         return {"success": True}
 
-    @app.post("/physton_prompt/move_up_favorite")
+    @router.post("/physton_prompt/move_up_favorite")
     async def _move_up_favorite(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
         if 'id' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
-        return {"success": hi.move_up_favorite(data['type'], data['id'])}
+        return {"success": History.get_instance().move_up_favorite(data['type'], data['id'])}
 
-    @app.post("/physton_prompt/move_down_favorite")
+    @router.post("/physton_prompt/move_down_favorite")
     async def _move_down_favorite(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
         if 'id' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
-        return {"success": hi.move_down_favorite(data['type'], data['id'])}
+        return {"success": History.get_instance().move_down_favorite(data['type'], data['id'])}
+
+    @router.post("/physton_prompt/reorder_favorites")
+    async def _reorder_favorites(request: Request):
+        data = await request.json()
+        if 'type' not in data:
+            return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
+        if 'ids' in data:
+            return {"success": History.get_instance().reorder_favorites(data['type'], data['ids'])}
+        if 'id' not in data:
+            return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
+        if 'position' not in data:
+            return {"success": False, "message": get_lang('is_required', {'0': 'position'})}
+        return {"success": History.get_instance().move_favorite(data['type'], data['id'], int(data['position']))}
 
-    @app.get("/physton_prompt/get_latest_history")
+    @router.get("/physton_prompt/get_latest_history")
     async def _get_latest_history(type: str):
-        return {"history": hi.get_latest_history(type)}
+        return {"history": History.get_instance().get_latest_history(type)}
 
-    @app.post("/physton_prompt/set_history")
+    @router.post("/physton_prompt/set_history")
     async def _set_history(request: Request):
         data = await request.json()
         if 'type' not in data:
@@ -255,9 +321,9 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'prompt'})}
         if 'name' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'name'})}
-        return {"success": hi.set_history(data['type'], data['id'], data['tags'], data['prompt'], data['name'])}
+        return {"success": History.get_instance().set_history(data['type'], data['id'], data['tags'], data['prompt'], data['name'])}
 
-    @app.post("/physton_prompt/set_history_name")
+    @router.post("/physton_prompt/set_history_name")
     async def _set_history_name(request: Request):
         data = await request.json()
         if 'type' not in data:
@@ -266,9 +332,9 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
         if 'name' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'name'})}
-        return {"success": hi.set_history_name(data['type'], data['id'], data['name'])}
+        return {"success": History.get_instance().set_history_name(data['type'], data['id'], data['name'])}
 
-    @app.post("/physton_prompt/set_favorite_name")
+    @router.post("/physton_prompt/set_favorite_name")
     async def _set_favorite_name(request: Request):
         data = await request.json()
         if 'type' not in data:
@@ -277,43 +343,63 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
         if 'name' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'name'})}
-        return {"success": hi.set_favorite_name(data['type'], data['id'], data['name'])}
+        return {"success": History.get_instance().set_favorite_name(data['type'], data['id'], data['name'])}
 
-    @app.post("/physton_prompt/dofavorite")
+    @router.post("/physton_prompt/dofavorite")
     async def _dofavorite(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
         if 'id' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
-        return {"success": hi.dofavorite(data['type'], data['id'])}
+        return {"success": History.get_instance().dofavorite(data['type'], data['id'])}
 
-    @app.post("/physton_prompt/unfavorite")
+    @router.post("/physton_prompt/unfavorite")
     async def _unfavorite(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
         if 'id' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
-        return {"success": hi.unfavorite(data['type'], data['id'])}
+        return {"success": History.get_instance().unfavorite(data['type'], data['id'])}
 
-    @app.post("/physton_prompt/delete_history")
+    @router.post("/physton_prompt/delete_history")
     async def _delete_history(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
         if 'id' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'id'})}
-        return {"success": hi.remove_history(data['type'], data['id'])}
+        return {"success": History.get_instance().remove_history(data['type'], data['id'])}
 
-    @app.post("/physton_prompt/delete_histories")
+    @router.post("/physton_prompt/delete_histories")
     async def _delete_histories(request: Request):
         data = await request.json()
         if 'type' not in data:
             return {"success": False, "message": get_lang('is_required', {'0': 'type'})}
-        return {"success": hi.remove_histories(data['type'])}
-
-    @app.post("/physton_prompt/translate")
+        return {"success": History.get_instance().remove_histories(data['type'])}
+
+    @router.get("/physton_prompt/tag_stats")
+    async def _tag_stats(type: str, top: int = 100, rebuild: bool = False):
+        if rebuild:
+            History.get_instance().rebuild_tag_stats(type)
+        return {"tags": History.get_instance().get_tag_stats(type, top)}
+
+    @router.get("/physton_prompt/export_histories")
+    async def _export_histories(kind: str = None, type: str = None):
+        lines = export_lines(History.get_instance(), kind, type)
+        return StreamingResponse(lines, media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": "attachment; filename=histories.ndjson"})
+
+    @router.post("/physton_prompt/import_histories")
+    async def _import_histories(request: Request, batch_size: int = 1000):
+        importer = HistoryImporter(History.get_instance(), batch_size)
+        # 导入会同步写入存储，放到线程池中执行，不阻塞其他请求；线程池会复制上下文，命名空间不变
+        async for chunk in request.stream():
+            await run_in_threadpool(importer.feed, chunk)
+        return {"success": True, **(await run_in_threadpool(importer.finish))}
+
+    @router.post("/physton_prompt/translate")
     async def _translate(request: Request):
         data = await request.json()
         if 'text' not in data:
@@ -328,7 +414,7 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'api_config'})}
         return translate(data['text'], data['from_lang'], data['to_lang'], data['api'], data['api_config'])
 
-    @app.post("/physton_prompt/translates")
+    @router.post("/physton_prompt/translates")
     async def _translates(request: Request):
         data = await request.json()
         if 'texts' not in data:
@@ -343,33 +429,98 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
             return {"success": False, "message": get_lang('is_required', {'0': 'api_config'})}
         return translate(data['texts'], data['from_lang'], data['to_lang'], data['api'], data['api_config'])
 
-    @app.get("/physton_prompt/get_csvs")
+    @router.get("/physton_prompt/translate_cache_stats")
+    async def _translate_cache_stats():
+        memory = get_translate_memory()
+        return {
+            "dictionary": translate_dictionary.stats(),
+            "memory": translate_cache.stats(),
+            "persistent": memory.stats() if memory else None,
+            "translators": translator_registry.stats(),
+        }
+
+    @router.get("/physton_prompt/export_translate_memory")
+    async def _export_translate_memory():
+        memory = get_translate_memory()
+        if memory is None:
+            return {"success": False, "message": get_lang('translate_memory_disabled')}
+        return StreamingResponse(memory.export_lines(), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": "attachment; filename=translate_memory.ndjson"})
+
+    @router.post("/physton_prompt/import_translate_memory")
+    async def _import_translate_memory(request: Request):
+        memory = get_translate_memory()
+        if memory is None:
+            return {"success": False, "message": get_lang('translate_memory_disabled')}
+        # 和导入历史记录一样边接收边导入，SQLite 的写入放到线程池中执行，不阻塞其他请求
+        result = {'imported': 0, 'invalid': 0}
+        buffer = b''
+        async for chunk in request.stream():
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+            if lines:
+                for key, value in (await run_in_threadpool(memory.import_lines, lines)).items():
+                    result[key] += value
+        for key, value in (await run_in_threadpool(memory.import_lines, [buffer])).items():
+            result[key] += value
+        return {"success": True, **result}
+
+    @router.post("/physton_prompt/compact_translate_memory")
+    async def _compact_translate_memory(request: Request):
+        memory = get_translate_memory()
+        if memory is None:
+            return {"success": False, "message": get_lang('translate_memory_disabled')}
+        data = await request.json()
+        return {"success": True, "deleted": await run_in_threadpool(memory.compact, data.get('max_entries', None))}
+
+    @router.get("/physton_prompt/translate_warm_up")
+    async def _get_translate_warm_up():
+        return translate_warm_up.get_progress()
+
+    @router.post("/physton_prompt/translate_warm_up")
+    async def _translate_warm_up(request: Request):
+        data = await request.json()
+        if 'action' not in data:
+            return {"success": False, "message": get_lang('is_required', {'0': 'action'})}
+        if data['action'] == 'start':
+            translate_warm_up.start()
+        elif data['action'] == 'pause':
+            translate_warm_up.pause()
+        elif data['action'] == 'resume':
+            translate_warm_up.resume()
+        elif data['action'] == 'stop':
+            translate_warm_up.stop()
+        else:
+            return {"success": False, "message": get_lang('is_invalid', {'0': 'action'})}
+        return {"success": True, **translate_warm_up.get_progress()}
+
+    @router.get("/physton_prompt/get_csvs")
     async def _get_csvs():
         return {"csvs": get_csvs()}
 
-    @app.get("/physton_prompt/get_csv")
+    @router.get("/physton_prompt/get_csv")
     async def _get_csv(key: str):
         file = get_csv(key)
         if not file:
             return Response(status_code=404)
         return FileResponse(file, media_type='text/csv', filename=os.path.basename(file))
 
-    @app.get("/physton_prompt/styles")
+    @router.get("/physton_prompt/styles")
     async def _styles(file: str):
         file_path = get_style_full_path(file)
         if not file_path or not os.path.exists(file_path):
             return Response(status_code=404)
         return FileResponse(file_path, filename=os.path.basename(file_path))
 
-    @app.get("/physton_prompt/get_extension_css_list")
+    @router.get("/physton_prompt/get_extension_css_list")
     async def _get_extension_css_list():
         return {"css_list": get_extension_css_list()}
 
-    @app.get("/physton_prompt/get_extra_networks")
+    @router.get("/physton_prompt/get_extra_networks")
     async def _get_extra_networks():
         return {"extra_networks": get_extra_networks()}
 
-    @app.post("/physton_prompt/gen_openai")
+    @router.post("/physton_prompt/gen_openai")
     async def _gen_openai(request: Request):
         data = await request.json()
         if 'messages' not in data:
@@ -381,7 +532,7 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
         except Exception as e:
             return {"success": False, 'message': str(e)}
 
-    @app.post("/physton_prompt/mbart50_initialize")
+    @router.post("/physton_prompt/mbart50_initialize")
     async def _mbart50_initialize(request: Request):
         try:
             mbart50_initialize(True)
@@ -389,10 +540,12 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
         except Exception as e:
             return {"success": False, 'message': str(e)}
 
-    @app.get("/physton_prompt/get_group_tags")
+    @router.get("/physton_prompt/get_group_tags")
     async def _get_group_tags(lang: str):
         return {"tags": get_group_tags(lang)}
 
+    app.include_router(router)
+
     try:
         translate_api = Storage.get('translateApi')
         if translate_api == 'mbart50':
@@ -400,6 +553,16 @@ def on_app_started(_: gr.Blocks, app: FastAPI):
     except Exception:
         pass
 
+    # 翻译缓存在后台预热，不阻塞启动
+    if TranslateWarmUp.enabled:
+        translate_warm_up.start()
+
+
+try:
+    # 重新加载 UI 时写入延迟合并写入中的数据
+    script_callbacks.on_script_unloaded(Storage.flush)
+except Exception:
+    pass
 
 try:
     script_callbacks.on_app_started(on_app_started)
@@ -6,10 +6,13 @@ from scripts.physton_prompt.storage import Storage
 # from scripts.physton_prompt.storage import Storage
 
 translate_apis = {}
+# API 的 key -> translate_apis.json 中的配置和所在的分组，加载时生成
+translate_api_index = {}
+translate_api_groups = {}
 
 
 def get_translate_apis(reload=False):
-    global translate_apis
+    global translate_apis, translate_api_index, translate_api_groups
     if reload or not translate_apis:
         translate_apis = {}
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,6 +20,14 @@ def get_translate_apis(reload=False):
         config_file = os.path.normpath(config_file)
         with open(config_file, 'r', encoding='utf8') as f:
             translate_apis = json.load(f)
+        index = {}
+        groups = {}
+        for group in translate_apis['apis']:
+            for item in group['children']:
+                index.setdefault(item['key'], item)
+                groups.setdefault(item['key'], group)
+        translate_api_index = index
+        translate_api_groups = groups
 
         # for group in translate_apis['apis']:
         #     for item in group['children']:
@@ -38,6 +49,22 @@ def get_translate_apis(reload=False):
     return translate_apis
 
 
+def get_translate_api(api):
+    """
+    按 key 查找 translate_apis.json 中的 API，找不到时返回 None
+    """
+    get_translate_apis()
+    return translate_api_index.get(api, None)
+
+
+def get_translate_api_group(api):
+    """
+    返回 API 所在的分组，例如离线模型的分组 type 为 offline_api，找不到时返回 None
+    """
+    get_translate_apis()
+    return translate_api_groups.get(api, None)
+
+
 def privacy_translate_api_config(data_key, data):
     # 如果 data 为空或者不是 dict
     if not data or not isinstance(data, dict):
@@ -51,16 +78,9 @@ def privacy_translate_api_config(data_key, data):
         if not data_key.startswith(start):
             return data
         api = data_key[len(start):]
-    apis = get_translate_apis()
-    find = False
-    for group in apis['apis']:
-        for item in group['children']:
-            if item['key'] == api:
-                find = item
-                break
-    if not find:
+    api_item = get_translate_api(api)
+    if not api_item:
         return data
-    api_item = find
     if 'config' not in api_item or not api_item['config']:
         return data
 
@@ -86,16 +106,9 @@ def unprotected_translate_api_config(data_key, data):
             return data
         api = data_key[len(start):]
 
-    apis = get_translate_apis()
-    find = False
-    for group in apis['apis']:
-        for item in group['children']:
-            if item['key'] == api:
-                find = item
-                break
-    if not find:
+    api_item = get_translate_api(api)
+    if not api_item:
         return data
-    api_item = find
     if 'config' not in api_item or not api_item['config']:
         return data
 
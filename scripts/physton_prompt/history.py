@@ -1,60 +1,379 @@
 from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.history_segments import HistorySegments
+from scripts.physton_prompt.history_index import HistoryIndex
+from scripts.physton_prompt.history_codec import HistoryCodec
+from scripts.physton_prompt.history_snapshot import HistorySnapshot, HistorySnapshots
+from scripts.physton_prompt.tag_stats import TagStats
+from collections import OrderedDict
+import os
+import json
 import uuid
+import hashlib
 import time
+import atexit
+import weakref
+import threading
 
 
 class History:
-    histories = {
-        'txt2img': [],
-        'txt2img_neg': [],
-        'img2img': [],
-        'img2img_neg': [],
-    }
-    favorites = {
-        'txt2img': [],
-        'txt2img_neg': [],
-        'img2img': [],
-        'img2img_neg': [],
-    }
+    types = ['txt2img', 'txt2img_neg', 'img2img', 'img2img_neg']
     max = 100
+    # 最多保留的历史记录数量，超过 max 的部分会作为冷数据分段压缩保存，默认与 max 相同即不保留冷数据
+    retention = int(os.environ.get('PHYSTON_PROMPT_HISTORY_RETENTION', '100'))
+    # 使用紧凑格式保存历史记录和收藏，设置为 0 时保存为旧格式
+    compact = os.environ.get('PHYSTON_PROMPT_HISTORY_COMPACT', '1') != '0'
+    # push_history 默认是否合并内容相同的历史记录
+    dedup = os.environ.get('PHYSTON_PROMPT_HISTORY_DEDUP', '0') == '1'
+    # 收藏按 rank 从小到大排序，新收藏的 rank 为最后一个加上间隔，移动时取前后两个的中间值
+    rank_gap = 1024
+    # 标签使用统计的得分每过多少天减半
+    tag_stats_half_life = float(os.environ.get('PHYSTON_PROMPT_TAG_STATS_HALF_LIFE', '30')) * 86400
+    # 标签统计在内存中增量更新，修改了这么多次（每次 push_history 或者一批导入）或者距离第一次修改超过这么多秒时才保存，
+    # 实例被淘汰、导入完成和进程退出时也会保存；来不及保存的部分可以用 rebuild_tag_stats 重建
+    tag_stats_save_every = int(os.environ.get('PHYSTON_PROMPT_TAG_STATS_SAVE_EVERY', '50'))
+    tag_stats_save_interval = 60
+    # 每个命名空间一个实例，只保留最近使用的实例，多用户时内存不会无限增长
+    instances = OrderedDict()
+    # 淘汰出去但还有请求在使用的实例，再次用到时放回 instances，保证同一个命名空间只有一个实例在读写存储
+    retired = weakref.WeakValueDictionary()
+    instances_lock = threading.Lock()
+    max_instances = int(os.environ.get('PHYSTON_PROMPT_HISTORY_MAX_INSTANCES', '64'))
 
-    def __init__(self):
-        for type in self.histories:
-            self.histories[type] = Storage.get('history.' + type)
-            if self.histories[type] is None:
-                self.histories[type] = []
-                self.__save_histories(type)
+    @staticmethod
+    def get_instance(namespace=None):
+        """
+        获取命名空间对应的实例，namespace 为 None 时使用当前请求的命名空间
+        """
+        if namespace is None:
+            namespace = Storage.get_namespace()
+        evicted = []
+        with History.instances_lock:
+            instance = History.instances.get(namespace)
+            if instance is None:
+                instance = History.retired.pop(namespace, None)
+                if instance is None:
+                    # 在锁内创建，不会同时创建两个实例；创建时不读取存储，开销很小
+                    instance = History(namespace)
+                History.instances[namespace] = instance
+            History.instances.move_to_end(namespace)
+            while len(History.instances) > History.max_instances:
+                key, item = History.instances.popitem(last=False)
+                History.retired[key] = item
+                evicted.append(item)
+        for item in evicted:
+            item.flush_tag_stats()
+        return instance
+
+    @staticmethod
+    def flush_all():
+        """
+        保存所有实例中还没保存的标签统计，进程退出时调用
+        """
+        with History.instances_lock:
+            items = list(History.instances.values()) + list(History.retired.values())
+        for item in items:
+            item.flush_tag_stats()
+
+    def __init__(self, namespace=''):
+        self.namespace = namespace
+        # type -> HistorySnapshot，读取时不加锁，修改时持有该类型的锁并替换为新的快照
+        # 创建实例时不读取存储，每个类型第一次用到时才加载，也可以调用 warm_up 在后台提前加载
+        self.histories = HistorySnapshots(lambda type: self.__load(self.histories, 'history.', type))
+        self.favorites = HistorySnapshots(lambda type: self.__load(self.favorites, 'favorite.', type))
+        self.locks = {type: threading.RLock() for type in self.types}
+        # 冷数据，第一次用到时才加载
+        self.segments = {}
+        # 搜索用的倒排索引，'history.<type>' / 'favorite.<type>' -> HistoryIndex，第一次搜索时才建立
+        self.indexes = {}
+        # 内容哈希 -> 热数据中的历史记录 id，第一次去重时才建立，只在持有该类型的锁时读写
+        self.hashes = {}
+        # type -> TagStats，第一次用到时从存储读取，没有保存过时从历史记录重建
+        self.tag_stats = {}
+        # type -> [还没保存的修改次数, 第一次修改的时间]
+        self.tag_stats_dirty = {}
+
+    def __load(self, snapshots, prefix, type):
+        with self.locks[type]:
+            if type not in snapshots:
+                with Storage.use_namespace(self.namespace):
+                    items = HistoryCodec.decode(Storage.get(prefix + type)) or []
+                for item in items:
+                    # 旧版本会把 is_favorite 写入存储，现在只在返回时计算
+                    item.pop('is_favorite', None)
+                if snapshots is self.favorites:
+                    items = self.__sort_favorites(items)
+                snapshots[type] = HistorySnapshot(items)
+            return snapshots[type]
+
+    def __sort_favorites(self, items):
+        # 旧版本没有 rank，按原来的顺序生成
+        if any(not isinstance(item.get('rank'), (int, float)) for item in items):
+            return self.__rerank(items)
+        return sorted(items, key=lambda item: item['rank'])
+
+    def __rerank(self, items):
+        return [dict(item, rank=(index + 1) * self.rank_gap) for index, item in enumerate(items)]
 
-        for type in self.favorites:
-            self.favorites[type] = Storage.get('favorite.' + type)
-            if self.favorites[type] is None:
-                self.favorites[type] = []
-                self.__save_favorites(type)
+    def __next_rank(self, favorites):
+        if len(favorites) == 0:
+            return self.rank_gap
+        return favorites.items[-1]['rank'] + self.rank_gap
+
+    def warm_up(self):
+        """
+        在后台线程中加载所有类型，返回该线程
+        """
+        def run():
+            for type in self.types:
+                try:
+                    self.histories[type]
+                    self.favorites[type]
+                except Exception as e:
+                    print(f'[sd-webui-prompt-all-in-one] Load history failed: {e}')
+
+        thread = threading.Thread(target=run, name='physton_prompt_history_warm_up', daemon=True)
+        thread.start()
+        return thread
+
+    def get_status(self):
+        """
+        每个类型的历史记录和收藏是否已经加载
+        """
+        return {type: {'histories': type in self.histories, 'favorites': type in self.favorites} for type in self.types}
+
+    def __encode(self, items):
+        if self.compact:
+            return HistoryCodec.encode(items)
+        return items
 
     def __save_histories(self, type):
-        Storage.set('history.' + type, self.histories[type])
+        with Storage.use_namespace(self.namespace):
+            Storage.set('history.' + type, self.__encode(self.histories[type].items))
 
     def __save_favorites(self, type):
-        Storage.set('favorite.' + type, self.favorites[type])
+        with Storage.use_namespace(self.namespace):
+            Storage.set('favorite.' + type, self.__encode(self.favorites[type].items))
+
+    def __get_segments(self, type):
+        if type not in self.segments:
+            with self.locks[type]:
+                if type not in self.segments:
+                    self.segments[type] = HistorySegments(self.namespace, type)
+        return self.segments[type]
+
+    def __get_raw_history(self, type, id):
+        history = self.histories[type].get(id)
+        if history is not None:
+            return history
+        with self.locks[type]:
+            return self.__get_segments(type).get(id)
 
-    def get_histories(self, type):
+    def __get_index(self, kind, type):
+        key = kind + '.' + type
+        if key not in self.indexes:
+            index = HistoryIndex()
+            if kind == 'history':
+                for item in self.__get_segments(type).iter_items():
+                    index.add(item)
+                items = self.histories[type].items
+            else:
+                items = self.favorites[type].items
+            for item in items:
+                index.add(item)
+            self.indexes[key] = index
+        return self.indexes[key]
+
+    def __index_add(self, kind, type, item):
+        # 索引还没建立时不需要维护，建立时会从数据中读取
+        index = self.indexes.get(kind + '.' + type)
+        if index is not None:
+            index.add(item)
+
+    def __index_refresh(self, type, id):
+        # 修改历史记录/收藏后重新索引这条记录
+        if 'history.' + type in self.indexes:
+            history = self.__get_raw_history(type, id)
+            if history is not None:
+                self.__index_add('history', type, history)
+        favorite = self.favorites[type].get(id)
+        if favorite is not None:
+            self.__index_add('favorite', type, favorite)
+
+    def __index_remove(self, kind, type, id):
+        index = self.indexes.get(kind + '.' + type)
+        if index is not None:
+            index.remove(id)
+
+    def __search(self, kind, type, query, limit, get_many, project):
+        # 倒排索引和冷数据会被修改，搜索时持有锁
+        with self.locks[type]:
+            index = self.__get_index(kind, type)
+            while True:
+                ids = index.search(query, limit)
+                items = get_many(ids)
+                # 冷数据按保留数量淘汰时不会通知索引，查到已经不存在的记录时再从索引中移除
+                stale = [id for id in ids if id not in items]
+                if not stale:
+                    return [project(items[id]) for id in ids]
+                for id in stale:
+                    index.remove(id)
+
+    def __get_many_histories(self, type, ids):
         histories = self.histories[type]
-        for history in histories:
-            history['is_favorite'] = self.is_favorite(type, history['id'])
-        return histories
+        items = {}
+        cold_ids = []
+        for id in ids:
+            history = histories.get(id)
+            if history is not None:
+                items[id] = history
+            else:
+                cold_ids.append(id)
+        if cold_ids:
+            items.update(self.__get_segments(type).get_many(cold_ids))
+        return items
+
+    def search_histories(self, type, query, limit=20, fields=None):
+        return self.__search('history', type, query, limit, lambda ids: self.__get_many_histories(type, ids),
+                             lambda history: self.__project_history(type, history, fields))
+
+    def __get_many_favorites(self, type, ids):
+        favorites = self.favorites[type]
+        return {id: favorites.get(id) for id in ids if id in favorites}
+
+    def search_favorites(self, type, query, limit=20, fields=None):
+        return self.__search('favorite', type, query, limit, lambda ids: self.__get_many_favorites(type, ids),
+                             lambda favorite: self.__project_favorite(type, favorite, fields))
+
+    def __project_history(self, type, history, fields=None):
+        is_favorite = history['id'] in self.favorites[type]
+        if fields is None:
+            return dict(history, is_favorite=is_favorite)
+        item = {field: history[field] for field in fields if field in history}
+        if 'is_favorite' in fields:
+            item['is_favorite'] = is_favorite
+        return item
+
+    def __project_favorite(self, type, favorite, fields=None):
+        if fields is None:
+            return favorite
+        return {field: favorite[field] for field in fields if field in favorite}
+
+    def __find_time(self, items, time, end=None):
+        # 从 end 往前找，返回第一条 time 小于指定时间的记录之后的位置，找不到时返回 0
+        end = len(items) if end is None else end
+        while end > 0 and items[end - 1]['time'] >= time:
+            end -= 1
+        return end
+
+    def __paginate(self, length, get_range, find, find_time, project, limit, cursor=None):
+        """
+        分页从最新（列表末尾）往前取，cursor 为上一页最后一条的 id，或者时间戳（只取更早的记录）
+        返回 (当前页, 下一页的 cursor)，没有下一页时 cursor 为 None
+        """
+        end = length
+        if cursor:
+            cursor = str(cursor)
+            if cursor.isdigit():
+                end = find_time(int(cursor))
+            else:
+                end = find(cursor)
+                if end < 0:
+                    return [], None
+        start = max(0, end - max(0, limit))
+        items = get_range(start, end)
+        page = [project(item) for item in reversed(items)]
+        next_cursor = items[0]['id'] if start > 0 and page else None
+        return page, next_cursor
+
+    def __paginate_snapshot(self, snapshot, project, limit, cursor=None):
+        items = snapshot.items
+        return self.__paginate(len(items), lambda start, end: items[start:end], snapshot.find,
+                               lambda time: self.__find_time(items, time), project, limit, cursor)
+
+    def get_histories(self, type, fields=None):
+        return [self.__project_history(type, history, fields) for history in self.histories[type].items]
+
+    def get_histories_page(self, type, limit, cursor=None, fields=None):
+        """
+        分页会接着热数据继续读取冷数据，冷数据排在热数据之前
+        """
+        def project(history):
+            return self.__project_history(type, history, fields)
+
+        segments = self.__get_segments(type)
+        if len(segments) == 0:
+            # 没有冷数据时只读快照，不需要加锁
+            return self.__paginate_snapshot(self.histories[type], project, limit, cursor)
+
+        with self.locks[type]:
+            snapshot = self.histories[type]
+            histories = snapshot.items
+            cold = len(segments)
+
+            def get_range(start, end):
+                items = segments.get_range(start, min(end, cold)) if start < cold else []
+                return items + histories[max(0, start - cold):max(0, end - cold)]
+
+            def find(id):
+                index = snapshot.find(id)
+                if index >= 0:
+                    return cold + index
+                return segments.find(id)
+
+            def find_time(time):
+                index = self.__find_time(histories, time)
+                if index > 0:
+                    return cold + index
+                return segments.find_time(time)
+
+            return self.__paginate(cold + len(histories), get_range, find, find_time, project, limit, cursor)
+
+    def get_history(self, type, id):
+        history = self.__get_raw_history(type, id)
+        if history is None:
+            return None
+        return self.__project_history(type, history)
 
     def is_favorite(self, type, id):
-        for favorite in self.favorites[type]:
-            if favorite['id'] == id:
-                return True
-        return False
+        return id in self.favorites[type]
+
+    def get_favorites(self, type, fields=None):
+        favorites = self.favorites[type].items
+        if fields is None:
+            return favorites
+        return [self.__project_favorite(type, favorite, fields) for favorite in favorites]
+
+    def get_favorites_page(self, type, limit, cursor=None, fields=None):
+        return self.__paginate_snapshot(self.favorites[type],
+                                        lambda favorite: self.__project_favorite(type, favorite, fields), limit, cursor)
+
+    def get_favorite(self, type, id):
+        return self.favorites[type].get(id)
+
+    @staticmethod
+    def __content_hash(tags, prompt):
+        # 忽略空白的差异以及标签的 id、翻译等不影响内容的字段
+        values = []
+        for tag in tags or []:
+            if isinstance(tag, dict):
+                values.append([' '.join(str(tag.get('value', '')).split()), bool(tag.get('disabled', False))])
+            else:
+                values.append(' '.join(str(tag).split()))
+        content = json.dumps([' '.join(str(prompt or '').split()), values], ensure_ascii=False)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
-    def get_favorites(self, type):
-        return self.favorites[type]
+    def __get_hashes(self, type):
+        if type not in self.hashes:
+            self.hashes[type] = {self.__content_hash(item.get('tags'), item.get('prompt')): item['id']
+                                 for item in self.histories[type].items}
+        return self.hashes[type]
 
-    def push_history(self, type, tags, prompt, name=''):
-        if len(self.histories[type]) >= self.max:
-            self.histories[type].pop(0)
+    def push_history(self, type, tags, prompt, name='', dedup=None):
+        """
+        dedup 为 True 时，如果热数据中已经有内容相同的记录，只更新它的时间和使用次数并移动到最后
+        """
+        if dedup is None:
+            dedup = self.dedup
         item = {
             'id': str(uuid.uuid1()),
             'time': int(time.time()),
@@ -62,8 +381,39 @@ class History:
             'tags': tags,
             'prompt': prompt,
         }
-        self.histories[type].append(item)
-        self.__save_histories(type)
+        with self.locks[type]:
+            if dedup:
+                content_hash = self.__content_hash(tags, prompt)
+                histories = self.histories[type]
+                index = histories.find(self.__get_hashes(type).get(content_hash))
+                if index >= 0:
+                    history = histories.items[index]
+                    history = dict(history, time=item['time'], use_count=history.get('use_count', 1) + 1)
+                    if name:
+                        history['name'] = name
+                    self.histories[type] = histories.move_to_end(index, history)
+                    self.__save_histories(type)
+                    self.__index_add('history', type, history)
+                    self.__count_tags(type, [history])
+                    return history
+            self.histories[type], evicted = self.histories[type].append(item, self.max)
+            hashes = self.hashes.get(type)
+            if hashes is not None:
+                if evicted is not None:
+                    evicted_hash = self.__content_hash(evicted.get('tags'), evicted.get('prompt'))
+                    if hashes.get(evicted_hash) == evicted['id']:
+                        del hashes[evicted_hash]
+                hashes[content_hash if dedup else self.__content_hash(tags, prompt)] = item['id']
+            if evicted is not None and self.retention > self.max:
+                # 先写入冷数据再保存热数据，中途出错最多重复一条而不会丢失
+                segments = self.__get_segments(type)
+                segments.push(evicted)
+                segments.trim(self.retention - self.max)
+            self.__save_histories(type)
+            if self.retention <= self.max and evicted is not None:
+                self.__index_remove('history', type, evicted['id'])
+            self.__index_add('history', type, item)
+            self.__count_tags(type, [item])
         return item
 
     def push_favorite(self, type, tags, prompt, name=''):
@@ -74,110 +424,334 @@ class History:
             'tags': tags,
             'prompt': prompt,
         }
-        self.favorites[type].append(item)
-        self.__save_favorites(type)
+        with self.locks[type]:
+            item['rank'] = self.__next_rank(self.favorites[type])
+            self.favorites[type], _ = self.favorites[type].append(item)
+            self.__save_favorites(type)
+            self.__index_add('favorite', type, item)
         return item
 
-    def move_up_favorite(self, type, id):
-        for index, favorite in enumerate(self.favorites[type]):
-            if favorite['id'] == id:
-                if index > 0:
-                    self.favorites[type].insert(index - 1, self.favorites[type].pop(index))
-                    self.__save_favorites(type)
-                    return True
+    def move_favorite(self, type, id, position):
+        """
+        把收藏移动到 position（get_favorites 返回的列表中的索引），只修改这一条的 rank，写入一次
+        """
+        with self.locks[type]:
+            favorites = self.favorites[type]
+            index = favorites.find(id)
+            if index < 0:
                 return False
-        return False
+            position = max(0, min(position, len(favorites) - 1))
+            if position == index:
+                return True
+            items = list(favorites.items)
+            item = items.pop(index)
+            items.insert(position, item)
+            before = items[position - 1]['rank'] if position > 0 else None
+            after = items[position + 1]['rank'] if position < len(items) - 1 else None
+            if before is None:
+                rank = after - self.rank_gap
+            elif after is None:
+                rank = before + self.rank_gap
+            else:
+                rank = (before + after) / 2
+            if (before is not None and rank <= before) or (after is not None and rank >= after):
+                # 间隔已经用完（浮点数精度不够），全部重新生成
+                items[position] = item
+                items = self.__rerank(items)
+            else:
+                items[position] = dict(item, rank=rank)
+            self.favorites[type] = HistorySnapshot(items)
+            self.__save_favorites(type)
+            return True
+
+    def reorder_favorites(self, type, ids):
+        """
+        按 ids 的顺序重新排列收藏，不在 ids 中的收藏保持原来的顺序排在后面，写入一次
+        """
+        with self.locks[type]:
+            favorites = self.favorites[type]
+            ordered = [favorites.get(id) for id in dict.fromkeys(ids) if id in favorites]
+            ordered_ids = set(item['id'] for item in ordered)
+            ordered += [item for item in favorites.items if item['id'] not in ordered_ids]
+            self.favorites[type] = HistorySnapshot(self.__rerank(ordered))
+            self.__save_favorites(type)
+            return True
+
+    def move_up_favorite(self, type, id):
+        with self.locks[type]:
+            index = self.favorites[type].find(id)
+            if index > 0:
+                return self.move_favorite(type, id, index - 1)
+            return False
 
     def move_down_favorite(self, type, id):
-        for index, favorite in enumerate(self.favorites[type]):
-            if favorite['id'] == id:
-                if index < len(self.favorites[type]) - 1:
-                    self.favorites[type].insert(index + 1, self.favorites[type].pop(index))
-                    self.__save_favorites(type)
-                    return True
-                return False
-        return False
+        with self.locks[type]:
+            index = self.favorites[type].find(id)
+            if 0 <= index < len(self.favorites[type]) - 1:
+                return self.move_favorite(type, id, index + 1)
+            return False
 
     def get_latest_history(self, type):
-        if len(self.histories[type]) > 0:
-            return self.histories[type][-1]
+        histories = self.histories[type].items
+        if len(histories) > 0:
+            return histories[-1]
         return None
 
+    def __update_history(self, type, id, fields):
+        # 修改热数据或冷数据中的一条历史记录，返回是否找到
+        histories = self.histories[type]
+        index = histories.find(id)
+        if index >= 0:
+            self.histories[type] = histories.replace(index, dict(histories.items[index], **fields))
+            self.__save_histories(type)
+            return True
+        return self.__get_segments(type).update(id, fields)
+
+    def __update_favorite(self, type, id, fields):
+        favorites = self.favorites[type]
+        index = favorites.find(id)
+        if index < 0:
+            return False
+        self.favorites[type] = favorites.replace(index, dict(favorites.items[index], **fields))
+        self.__save_favorites(type)
+        return True
+
     def set_history(self, type, id, tags, prompt, name):
-        for history in self.histories[type]:
-            if history['id'] == id:
-                history['tags'] = tags
-                history['prompt'] = prompt
-                history['name'] = name
-                self.__save_histories(type)
-                if self.is_favorite(type, id):
-                    self.set_favorite(type, id, tags, prompt, name)
-                return True
-        return False
+        with self.locks[type]:
+            if not self.__update_history(type, id, {'tags': tags, 'prompt': prompt, 'name': name}):
+                return False
+            self.hashes.pop(type, None)
+            self.__update_favorite(type, id, {'tags': tags, 'prompt': prompt, 'name': name})
+            self.__index_refresh(type, id)
+            return True
 
     def set_favorite(self, type, id, tags, prompt, name):
-        for favorite in self.favorites[type]:
-            if favorite['id'] == id:
-                favorite['tags'] = tags
-                favorite['prompt'] = prompt
-                favorite['name'] = name
-                self.__save_favorites(type)
-                return True
-        return False
+        with self.locks[type]:
+            if not self.__update_favorite(type, id, {'tags': tags, 'prompt': prompt, 'name': name}):
+                return False
+            self.__index_add('favorite', type, self.favorites[type].get(id))
+            return True
 
     def set_history_name(self, type, id, name):
-        for history in self.histories[type]:
-            if history['id'] == id:
-                history['name'] = name
-                self.__save_histories(type)
-                for favorite in self.favorites[type]:
-                    if favorite['id'] == id:
-                        favorite['name'] = name
-                        self.__save_favorites(type)
-                return True
-        return False
+        with self.locks[type]:
+            if not self.__update_history(type, id, {'name': name}):
+                return False
+            self.__update_favorite(type, id, {'name': name})
+            self.__index_refresh(type, id)
+            return True
 
     def set_favorite_name(self, type, id, name):
-        for favorite in self.favorites[type]:
-            if favorite['id'] == id:
-                favorite['name'] = name
-                self.__save_favorites(type)
-                for history in self.histories[type]:
-                    if history['id'] == id:
-                        history['name'] = name
-                        self.__save_histories(type)
-                return True
-        return False
+        with self.locks[type]:
+            if not self.__update_favorite(type, id, {'name': name}):
+                return False
+            if id in self.histories[type] or self.retention > self.max:
+                self.__update_history(type, id, {'name': name})
+            self.__index_refresh(type, id)
+            return True
 
     def dofavorite(self, type, id):
-        if self.is_favorite(type, id):
-            return False
-        for history in self.histories[type]:
-            if history['id'] == id:
-                self.favorites[type].append(history)
-                self.__save_favorites(type)
-                return True
-        return False
+        with self.locks[type]:
+            if self.is_favorite(type, id):
+                return False
+            history = self.__get_raw_history(type, id)
+            if history is None:
+                return False
+            favorite = dict(history, rank=self.__next_rank(self.favorites[type]))
+            self.favorites[type], _ = self.favorites[type].append(favorite)
+            self.__save_favorites(type)
+            self.__index_add('favorite', type, favorite)
+            return True
 
     def unfavorite(self, type, id):
-        if not self.is_favorite(type, id):
-            return False
-        for favorite in self.favorites[type]:
-            if favorite['id'] == id:
-                self.favorites[type].remove(favorite)
-                self.__save_favorites(type)
-                return True
-        return False
+        with self.locks[type]:
+            favorites = self.favorites[type]
+            index = favorites.find(id)
+            if index < 0:
+                return False
+            self.favorites[type] = favorites.remove(index)
+            self.__save_favorites(type)
+            self.__index_remove('favorite', type, id)
+            return True
 
     def remove_history(self, type, id):
-        for history in self.histories[type]:
-            if history['id'] == id:
-                self.histories[type].remove(history)
+        with self.locks[type]:
+            histories = self.histories[type]
+            index = histories.find(id)
+            if index >= 0:
+                self.histories[type] = histories.remove(index)
                 self.__save_histories(type)
-                return True
-        return False
+                self.hashes.pop(type, None)
+            elif not self.__get_segments(type).remove(id):
+                return False
+            self.__index_remove('history', type, id)
+            return True
 
     def remove_histories(self, type):
-        self.histories[type] = []
-        self.__save_histories(type)
-        return True
+        with self.locks[type]:
+            self.histories[type] = HistorySnapshot()
+            self.hashes.pop(type, None)
+            self.__save_histories(type)
+            self.__get_segments(type).clear()
+            self.indexes.pop('history.' + type, None)
+            return True
+
+    def __save_tag_stats(self, type):
+        self.tag_stats_dirty.pop(type, None)
+        with Storage.use_namespace(self.namespace):
+            Storage.set('tag_stats.' + type, self.tag_stats[type].to_data())
+
+    def flush_tag_stats(self, type=None):
+        """
+        立即保存还没保存的标签统计，type 为 None 时保存所有类型
+        """
+        for item in ([type] if type else self.types):
+            if item not in self.tag_stats_dirty:
+                continue
+            with self.locks[item]:
+                if item in self.tag_stats_dirty:
+                    self.__save_tag_stats(item)
+
+    def __get_tag_stats(self, type):
+        """
+        返回 (统计, 是否刚从历史记录重建)
+        """
+        if type in self.tag_stats:
+            return self.tag_stats[type], False
+        with self.locks[type]:
+            if type in self.tag_stats:
+                return self.tag_stats[type], False
+            with Storage.use_namespace(self.namespace):
+                data = Storage.get('tag_stats.' + type)
+            stats = TagStats.from_data(data, self.tag_stats_half_life)
+            if stats is None:
+                return self.rebuild_tag_stats(type), True
+            self.tag_stats[type] = stats
+            return stats, False
+
+    def __count_tags(self, type, items, use_count=False):
+        # 调用方需要持有该类型的锁并且已经写入了 items，只统计这些记录，不重新遍历历史记录
+        stats, rebuilt = self.__get_tag_stats(type)
+        if rebuilt:
+            # 重建时已经统计过 items
+            return
+        for item in items:
+            count = item.get('use_count', 1) if use_count else 1
+            stats.add(TagStats.get_values(item.get('tags'), item.get('prompt')), item.get('time'), count)
+        dirty = self.tag_stats_dirty.setdefault(type, [0, time.time()])
+        dirty[0] += 1
+        if dirty[0] >= self.tag_stats_save_every or time.time() - dirty[1] >= self.tag_stats_save_interval:
+            self.__save_tag_stats(type)
+
+    def rebuild_tag_stats(self, type):
+        """
+        遍历一次历史记录（包括冷数据）重新统计，合并过的记录按 use_count 计数
+        """
+        stats = TagStats(self.tag_stats_half_life)
+        with self.locks[type]:
+            for item in self.iter_histories(type):
+                stats.add(TagStats.get_values(item.get('tags'), item.get('prompt')), item.get('time'),
+                          item.get('use_count', 1))
+            self.tag_stats[type] = stats
+            self.__save_tag_stats(type)
+        return stats
+
+    def get_tag_stats(self, type, top=None):
+        """
+        按当前得分从高到低返回标签使用统计
+        """
+        with self.locks[type]:
+            return self.__get_tag_stats(type)[0].top(top)
+
+    def iter_histories(self, type, chunk_size=1000):
+        """
+        从最旧到最新逐条返回历史记录（包括冷数据），每次只在锁内读取一段，
+        导出过程中有修改时可能会重复或遗漏被修改的记录
+        """
+        position = 0
+        while True:
+            with self.locks[type]:
+                segments = self.__get_segments(type)
+                cold = len(segments)
+                if position < cold:
+                    items = segments.get_range(position, min(position + chunk_size, cold))
+                else:
+                    items = None
+                    position -= cold
+            if items is None:
+                break
+            position += len(items)
+            yield from items
+        yield from self.histories[type].items[position:]
+
+    def iter_favorites(self, type):
+        yield from self.favorites[type].items
+
+    def __prepare_import(self, items, exists):
+        # 补全字段，去掉已存在和重复的 id，返回 (需要导入的记录, 跳过的数量)
+        prepared = []
+        ids = set()
+        skipped = 0
+        for item in items:
+            id = item.get('id') if isinstance(item, dict) else None
+            if not id or id in ids or exists(id):
+                skipped += 1
+                continue
+            ids.add(id)
+            item = dict(item)
+            item.pop('is_favorite', None)
+            item['id'] = str(id)
+            item['time'] = int(item.get('time') or time.time())
+            item.setdefault('name', '')
+            item.setdefault('tags', [])
+            item.setdefault('prompt', '')
+            prepared.append(item)
+        return prepared, skipped
+
+    def import_histories(self, type, items):
+        """
+        批量导入历史记录，按 id 合并，已存在的记录跳过，只写入一次存储，返回 (导入数量, 跳过数量)
+        导入的记录与热数据按时间排序，超出 max 的部分按 retention 进入冷数据或被淘汰
+        """
+        with self.locks[type]:
+            histories = self.histories[type]
+            segments = self.__get_segments(type)
+            items, skipped = self.__prepare_import(items, lambda id: id in histories or segments.contains(id))
+            if not items:
+                return 0, skipped
+            merged = sorted(histories.items + items, key=lambda item: item['time'])
+            evicted = merged[:-self.max] if len(merged) > self.max else []
+            self.histories[type] = HistorySnapshot(merged[len(evicted):])
+            if evicted and self.retention > self.max:
+                segments.extend(evicted)
+                segments.trim(self.retention - self.max)
+            self.__save_histories(type)
+            self.hashes.pop(type, None)
+            for item in items:
+                self.__index_add('history', type, item)
+            self.__count_tags(type, items, True)
+            if self.retention <= self.max:
+                for item in evicted:
+                    self.__index_remove('history', type, item['id'])
+            return len(items), skipped
+
+    def import_favorites(self, type, items):
+        """
+        批量导入收藏，追加到末尾，按 id 合并，已存在的记录跳过，只写入一次存储，返回 (导入数量, 跳过数量)
+        """
+        with self.locks[type]:
+            favorites = self.favorites[type]
+            items, skipped = self.__prepare_import(items, lambda id: id in favorites)
+            if not items:
+                return 0, skipped
+            rank = self.__next_rank(favorites)
+            for item in items:
+                item['rank'] = rank
+                rank += self.rank_gap
+            self.favorites[type] = HistorySnapshot(favorites.items + items)
+            self.__save_favorites(type)
+            for item in items:
+                self.__index_add('favorite', type, item)
+            return len(items), skipped
+
+
+atexit.register(History.flush_all)
@@ -0,0 +1,70 @@
+class HistoryCodec:
+    """
+    历史记录/收藏的紧凑存储格式，同样的标签在整份数据里只保存一次：
+    {"version": 2, "tags": [标签, ...], "items": [...]}
+    tags 是去重后的标签（id 字段置为 null），items 中每条记录的 tags 保存为引用：
+    有 id 的标签为 "索引:id" 字符串，没有 id 的标签为索引数字，id 不是字符串或值无法去重的标签原样保存，
+    不是字典的标签包一层列表保存
+    旧格式（直接保存记录列表）读取时原样返回，下一次保存时写成新格式
+    """
+    version = 2
+
+    @staticmethod
+    def is_encoded(data):
+        return isinstance(data, dict) and data.get('version') == HistoryCodec.version
+
+    @staticmethod
+    def encode(items):
+        # ((字段, 值的类型, 值), ...) -> 索引，带上类型是因为 1、1.0 和 True 作为 key 是相等的
+        templates = {}
+
+        def encode_tag(tag):
+            if not isinstance(tag, dict):
+                return [tag]
+            if 'id' in tag and not isinstance(tag['id'], str):
+                return tag
+            key = tuple((name, None, None) if name == 'id' else (name, value.__class__, value) for name, value in tag.items())
+            try:
+                index = templates.get(key)
+                if index is None:
+                    index = templates[key] = len(templates)
+            except TypeError:
+                # 值里有列表/字典时无法去重
+                return tag
+            if 'id' in tag:
+                return f"{index}:{tag['id']}"
+            return index
+
+        encoded_items = []
+        for item in items:
+            if isinstance(item.get('tags'), list):
+                item = dict(item, tags=[encode_tag(tag) for tag in item['tags']])
+            encoded_items.append(item)
+        return {
+            'version': HistoryCodec.version,
+            'tags': [{name: value for name, _, value in template} for template in templates],
+            'items': encoded_items,
+        }
+
+    @staticmethod
+    def decode(data):
+        if not HistoryCodec.is_encoded(data):
+            return data
+        templates = data['tags']
+
+        def decode_tag(tag):
+            if isinstance(tag, int):
+                return dict(templates[tag])
+            if isinstance(tag, list):
+                return tag[0]
+            if isinstance(tag, str):
+                index, _, id = tag.partition(':')
+                tag = dict(templates[int(index)])
+                tag['id'] = id
+            return tag
+
+        items = data['items']
+        for item in items:
+            if isinstance(item.get('tags'), list):
+                item['tags'] = [decode_tag(tag) for tag in item['tags']]
+        return items
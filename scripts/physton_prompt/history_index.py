@@ -0,0 +1,184 @@
+import re
+import heapq
+import itertools
+import bisect
+
+
+class HistoryIndex:
+    """
+    历史记录/收藏的倒排索引，词来自 name、tags 和 prompt，查询时每个词按前缀匹配，
+    多个词之间是“与”的关系，按匹配得分和时间排序
+    """
+    # 不同字段命中时的权重
+    name_weight = 3
+    tag_weight = 2
+    prompt_weight = 1
+    # 完整匹配一个词比只匹配前缀的得分更高
+    exact_bonus = 2
+
+    def __init__(self):
+        # 词 -> {权重: id 的集合}，权重只有几种，查询时按权重分组用集合运算合并，不需要逐条遍历
+        self.postings = {}
+        # id -> ((词, 权重), ...)
+        self.documents = {}
+        # id -> time，用于排序
+        self.times = {}
+        # 排好序的词，用于前缀查找，有新词或删除词时置为 None，下次查询时重建
+        self.tokens = None
+
+    @staticmethod
+    def tokenize(text):
+        if not text:
+            return []
+        return re.findall(r'[^\W_]+', str(text).lower())
+
+    def __item_weights(self, item):
+        tag_texts = []
+        for tag in item.get('tags') or []:
+            if isinstance(tag, dict):
+                tag_texts.append(str(tag.get('value') or ''))
+                tag_texts.append(str(tag.get('localValue') or ''))
+            else:
+                tag_texts.append(str(tag))
+        weights = {}
+        for text, weight in [(item.get('name'), self.name_weight), (' '.join(tag_texts), self.tag_weight),
+                             (item.get('prompt'), self.prompt_weight)]:
+            for token in self.tokenize(text):
+                weights[token] = weights.get(token, 0) + weight
+        return weights
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, item):
+        """
+        添加或更新一条记录
+        """
+        id = item['id']
+        self.remove(id)
+        weights = self.__item_weights(item)
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                self.tokens = None
+            ids = posting.get(weight)
+            if ids is None:
+                posting[weight] = {id}
+            else:
+                ids.add(id)
+        self.documents[id] = tuple(weights.items())
+        self.times[id] = item.get('time', 0)
+
+    def remove(self, id):
+        document = self.documents.pop(id, None)
+        if document is None:
+            return
+        del self.times[id]
+        for token, weight in document:
+            posting = self.postings[token]
+            ids = posting[weight]
+            ids.discard(id)
+            if not ids:
+                del posting[weight]
+                if not posting:
+                    del self.postings[token]
+                    self.tokens = None
+
+    def clear(self):
+        self.postings = {}
+        self.documents = {}
+        self.times = {}
+        self.tokens = None
+
+    def __expand(self, prefix):
+        if self.tokens is None:
+            self.tokens = sorted(self.postings)
+        index = bisect.bisect_left(self.tokens, prefix)
+        while index < len(self.tokens) and self.tokens[index].startswith(prefix):
+            yield self.tokens[index]
+            index += 1
+
+    def __term_levels(self, term):
+        """
+        返回 [(得分, [id 的集合, ...]), ...]，按得分从高到低，完整匹配的权重乘以 exact_bonus
+        """
+        groups = {}
+        for token in self.__expand(term):
+            multiple = self.exact_bonus if token == term else 1
+            for weight, ids in self.postings[token].items():
+                groups.setdefault(weight * multiple, []).append(ids)
+        return sorted(groups.items(), reverse=True)
+
+    def search(self, query, limit=None):
+        """
+        返回按得分从高到低排序的 id 列表，得分相同时较新的在前
+        """
+        terms = []
+        for term in dict.fromkeys(self.tokenize(query)):
+            levels = self.__term_levels(term)
+            if not levels:
+                return []
+            terms.append(levels)
+        if not terms:
+            return []
+
+        # 每个词取一个得分组，按得分之和从高到低枚举组合，组合内的集合求交集。
+        # 一条记录第一次出现时的得分就是每个词取最高得分之和，之后再出现的跳过，
+        # 所以前缀展开出的多个词取最高得分，与顺序无关；凑够 limit 条后就不再处理更低的得分
+        unions = {}
+
+        def level_ids(index, level):
+            ids = unions.get((index, level))
+            if ids is None:
+                sets = terms[index][level][1]
+                # 只有一个集合时直接使用倒排表中的集合，不复制，下面不能修改它
+                ids = unions[(index, level)] = sets[0] if len(sets) == 1 else set().union(*sets)
+            return ids
+
+        state = (0,) * len(terms)
+        heap = [(-sum(levels[0][0] for levels in terms), state)]
+        queued = {state}
+        seen = set()
+        ids = []
+        bucket_score = None
+        bucket = []
+        while heap:
+            score, state = heapq.heappop(heap)
+            if score != bucket_score:
+                if bucket:
+                    ids += self.__newest(bucket, limit, len(ids))
+                    if limit is not None and len(ids) >= limit:
+                        return ids
+                bucket_score = score
+                bucket = []
+            for index, level in enumerate(state):
+                if level + 1 < len(terms[index]):
+                    next_state = state[:index] + (level + 1,) + state[index + 1:]
+                    if next_state not in queued:
+                        queued.add(next_state)
+                        heapq.heappush(heap, (score + terms[index][level][0] - terms[index][level + 1][0], next_state))
+            # 从最小的集合开始求交集
+            sets = sorted((level_ids(index, level) for index, level in enumerate(state)), key=len)
+            if len(sets) == 1 and not seen:
+                matched = sets[0]
+            else:
+                matched = sets[0].intersection(*sets[1:])
+                matched -= seen
+            if matched:
+                # 最后一个组合不需要再记录
+                if heap:
+                    seen |= matched
+                bucket.append(matched)
+        if bucket:
+            ids += self.__newest(bucket, limit, len(ids))
+        return ids
+
+    def __newest(self, bucket, limit, count):
+        """
+        得分相同的一组记录按时间取最新的，比对所有结果做元组比较快很多
+        """
+        items = bucket[0] if len(bucket) == 1 else itertools.chain(*bucket)
+        if limit is None:
+            return sorted(items, key=self.times.__getitem__, reverse=True)
+        return heapq.nlargest(limit - count, items, key=self.times.__getitem__)
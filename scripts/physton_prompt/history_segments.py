@@ -0,0 +1,314 @@
+import os
+import json
+import gzip
+import uuid
+import bisect
+import tempfile
+from collections import OrderedDict
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.storage_engine.list_journal import ListJournal
+
+
+class HistorySegments:
+    """
+    历史记录的冷数据。
+    热数据（History.histories）淘汰出来的记录先追加到 history_segments/<type>/overflow.ndjson，
+    这是一个追加式日志（ListJournal），和存储的列表模式无关，每次追加只写一行；
+    攒够 segment_size 条后压缩写入一个不可变的分段文件（history_segments/<type>/*.json.gz），
+    分段清单保存在 history.<type>.segments。修改分段中的记录时写入新的分段文件再替换清单。
+    这里的位置都是冷数据内部的位置，0 为最旧的一条。
+    """
+    segment_size = 1000
+    # 内存中最多缓存的已解压分段数量
+    cache_size = 16
+    # overflow 日志中追加的操作超过这么多字节（并且超过快照本身）时压缩成快照
+    journal_compaction_bytes = 1024 * 1024
+
+    def __init__(self, namespace, type):
+        self.namespace = namespace
+        self.type = type
+        # 旧版本把 overflow 保存在存储的这个列表中，第一次加载时迁移到日志
+        self.overflow_key = f'history.{type}.overflow'
+        self.manifest_key = f'history.{type}.segments'
+        with Storage.use_namespace(self.namespace):
+            self.directory = os.path.join(Storage.get_path(), 'history_segments', type)
+            self.journal = ListJournal(os.path.join(self.directory, 'overflow.ndjson'))
+            if not self.journal.refresh():
+                overflow = Storage.get(self.overflow_key) or []
+                if overflow:
+                    self.__save_overflow(overflow)
+                    Storage.delete(self.overflow_key)
+            self.manifest = Storage.get(self.manifest_key) or []
+        self.cache = OrderedDict()
+        # id -> 分段文件名，在 overflow 中时为 None；第一次按 id 查找冷数据时才建立
+        self.index = None
+        self.__recount()
+
+    def __recount(self):
+        self.starts = []
+        self.file_positions = {}
+        total = 0
+        for position, segment in enumerate(self.manifest):
+            self.starts.append(total)
+            self.file_positions[segment['file']] = position
+            total += segment['count']
+        self.segments_count = total
+
+    @property
+    def overflow(self):
+        return self.journal.items
+
+    def __len__(self):
+        return self.segments_count + len(self.overflow)
+
+    def __save_manifest(self):
+        with Storage.use_namespace(self.namespace):
+            Storage.set(self.manifest_key, self.manifest)
+        self.__recount()
+
+    def __save_overflow(self, items):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.journal.write_snapshot(list(items))
+
+    def __append_overflow(self, op):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        item = self.journal.append(op)
+        if self.journal.needs_compaction(self.journal_compaction_bytes):
+            self.journal.write_snapshot(list(self.journal.items))
+        return item
+
+    def __read_segment(self, segment):
+        name = segment['file']
+        if name in self.cache:
+            self.cache.move_to_end(name)
+            return self.cache[name]
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            items = json.loads(gzip.decompress(f.read()).decode('utf-8'))
+        self.__cache_segment(name, items)
+        return items
+
+    def __cache_segment(self, name, items):
+        self.cache[name] = items
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def __write_segment(self, items):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        name = str(uuid.uuid4()) + '.json.gz'
+        data = gzip.compress(json.dumps(items, ensure_ascii=False).encode('utf-8'))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise e
+        self.__cache_segment(name, items)
+        if self.index is not None:
+            for item in items:
+                self.index[item['id']] = name
+        return {
+            'file': name,
+            'count': len(items),
+            'first_time': items[0]['time'],
+            'last_time': items[-1]['time'],
+        }
+
+    def __delete_segment_file(self, segment):
+        self.cache.pop(segment['file'], None)
+        try:
+            os.remove(os.path.join(self.directory, segment['file']))
+        except FileNotFoundError:
+            pass
+
+    def __get_index(self):
+        if self.index is None:
+            self.index = {}
+            for segment in self.manifest:
+                for item in self.__read_segment(segment):
+                    self.index[item['id']] = segment['file']
+            for item in self.overflow:
+                self.index[item['id']] = None
+        return self.index
+
+    def push(self, item):
+        self.__append_overflow({'op': 'push', 'item': item})
+        if self.index is not None:
+            self.index[item['id']] = None
+        if len(self.overflow) >= self.segment_size:
+            self.manifest.append(self.__write_segment(list(self.overflow)))
+            self.__save_manifest()
+            self.__save_overflow([])
+
+    def extend(self, items):
+        """
+        批量追加，装满的分段直接写入文件，清单和 overflow 各只保存一次
+        """
+        if not items:
+            return
+        overflow = self.overflow + list(items)
+        if self.index is not None:
+            for item in items:
+                self.index[item['id']] = None
+        sealed = False
+        while len(overflow) >= self.segment_size:
+            self.manifest.append(self.__write_segment(overflow[:self.segment_size]))
+            overflow = overflow[self.segment_size:]
+            sealed = True
+        if sealed:
+            self.__save_manifest()
+        self.__save_overflow(overflow)
+
+    def trim(self, max_count):
+        """
+        冷数据超过 max_count 条时淘汰最旧的数据，分段整个删除，所以最多会多保留一个分段
+        """
+        while self.manifest and len(self) - self.manifest[0]['count'] >= max_count:
+            segment = self.manifest.pop(0)
+            if self.index is not None:
+                for item in self.__read_segment(segment):
+                    self.index.pop(item['id'], None)
+            self.__save_manifest()
+            self.__delete_segment_file(segment)
+        while not self.manifest and len(self.overflow) > max_count:
+            item = self.__append_overflow({'op': 'shift'})
+            if self.index is not None:
+                self.index.pop(item['id'], None)
+
+    def get_range(self, start, end):
+        """
+        返回 [start, end) 位置的记录，只会读取涉及到的分段
+        """
+        items = []
+        if start < self.segments_count:
+            position = bisect.bisect_right(self.starts, start) - 1
+            while position < len(self.manifest) and self.starts[position] < end:
+                offset = self.starts[position]
+                segment_items = self.__read_segment(self.manifest[position])
+                items += segment_items[max(0, start - offset):end - offset]
+                position += 1
+        if end > self.segments_count:
+            items += self.overflow[max(0, start - self.segments_count):end - self.segments_count]
+        return items
+
+    def iter_items(self):
+        for segment in list(self.manifest):
+            yield from self.__read_segment(segment)
+        yield from list(self.overflow)
+
+    def contains(self, id):
+        return id in self.__get_index()
+
+    def find(self, id):
+        """
+        返回 id 对应的位置，不存在时返回 -1
+        """
+        index = self.__get_index()
+        if id not in index:
+            return -1
+        name = index[id]
+        if name is None:
+            items = self.overflow
+            offset = self.segments_count
+        else:
+            position = self.file_positions[name]
+            items = self.__read_segment(self.manifest[position])
+            offset = self.starts[position]
+        for i, item in enumerate(items):
+            if item['id'] == id:
+                return offset + i
+        return -1
+
+    def find_time(self, time):
+        """
+        从最新往前找，返回第一条 time 小于指定时间的记录之后的位置
+        """
+        for i in range(len(self.overflow) - 1, -1, -1):
+            if self.overflow[i]['time'] < time:
+                return self.segments_count + i + 1
+        for position in range(len(self.manifest) - 1, -1, -1):
+            segment = self.manifest[position]
+            if segment['first_time'] >= time:
+                continue
+            items = self.__read_segment(segment)
+            for i in range(len(items) - 1, -1, -1):
+                if items[i]['time'] < time:
+                    return self.starts[position] + i + 1
+        return 0
+
+    def get(self, id):
+        position = self.find(id)
+        if position < 0:
+            return None
+        return self.get_range(position, position + 1)[0]
+
+    def get_many(self, ids):
+        """
+        返回 {id: 记录}，不存在的 id 不包含在结果中，同一个分段只会读取一次
+        """
+        index = self.__get_index()
+        groups = {}
+        for id in ids:
+            if id in index:
+                groups.setdefault(index[id], set()).add(id)
+        items = {}
+        for name, group in groups.items():
+            if name is None:
+                segment_items = self.overflow
+            else:
+                segment_items = self.__read_segment(self.manifest[self.file_positions[name]])
+            for item in segment_items:
+                if item['id'] in group:
+                    items[item['id']] = item
+        return items
+
+    def __rewrite(self, id, change):
+        """
+        change(items, offset) 修改包含 id 的那一段记录（列表副本），分段会写入新文件
+        """
+        position = self.find(id)
+        if position < 0:
+            return False
+        if position >= self.segments_count:
+            overflow = list(self.overflow)
+            change(overflow, position - self.segments_count)
+            self.__save_overflow(overflow)
+            return True
+        segment_position = bisect.bisect_right(self.starts, position) - 1
+        old_segment = self.manifest[segment_position]
+        items = list(self.__read_segment(old_segment))
+        change(items, position - self.starts[segment_position])
+        if items:
+            self.manifest[segment_position] = self.__write_segment(items)
+        else:
+            self.manifest.pop(segment_position)
+        self.__save_manifest()
+        self.__delete_segment_file(old_segment)
+        return True
+
+    def update(self, id, fields):
+        def change(items, offset):
+            items[offset] = dict(items[offset], **fields)
+        return self.__rewrite(id, change)
+
+    def remove(self, id):
+        def change(items, offset):
+            items.pop(offset)
+            if self.index is not None:
+                self.index.pop(id, None)
+        return self.__rewrite(id, change)
+
+    def clear(self):
+        for segment in self.manifest:
+            self.__delete_segment_file(segment)
+        self.manifest = []
+        self.index = {}
+        self.__save_manifest()
+        self.__save_overflow([])
@@ -0,0 +1,74 @@
+class HistorySnapshot:
+    """
+    某个类型的历史记录或收藏的只读快照。
+    快照发布后 items、indexes 以及其中的每条记录都不会再被修改，修改时复制出新的快照整体替换，
+    读取时先取出快照再读，不需要加锁，也不会读到修改了一半的数据。
+    """
+    __slots__ = ('items', 'indexes')
+
+    def __init__(self, items=None, indexes=None):
+        self.items = items if items is not None else []
+        # id -> 索引，同时作为 id 的集合
+        if indexes is None:
+            indexes = {item['id']: index for index, item in enumerate(self.items)}
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, id):
+        return id in self.indexes
+
+    def find(self, id):
+        return self.indexes.get(id, -1)
+
+    def get(self, id):
+        index = self.indexes.get(id)
+        if index is None:
+            return None
+        return self.items[index]
+
+    def append(self, item, max=None):
+        """
+        返回 (新快照, 被淘汰的记录)，超过 max 条时从头部淘汰
+        """
+        items = self.items + [item]
+        evicted = None
+        if max is not None and len(items) > max:
+            evicted = items.pop(0)
+            return HistorySnapshot(items), evicted
+        indexes = dict(self.indexes)
+        indexes[item['id']] = len(items) - 1
+        return HistorySnapshot(items, indexes), evicted
+
+    def replace(self, index, item):
+        items = list(self.items)
+        items[index] = item
+        return HistorySnapshot(items, self.indexes)
+
+    def remove(self, index):
+        items = list(self.items)
+        items.pop(index)
+        return HistorySnapshot(items)
+
+    def move_to_end(self, index, item):
+        """
+        把 index 处的记录替换为 item 并移动到末尾
+        """
+        items = list(self.items)
+        items.pop(index)
+        items.append(item)
+        return HistorySnapshot(items)
+
+
+class HistorySnapshots(dict):
+    """
+    type -> HistorySnapshot，第一次访问某个类型时才调用 load(type) 加载并返回快照
+    """
+
+    def __init__(self, load):
+        super().__init__()
+        self.load = load
+
+    def __missing__(self, type):
+        return self.load(type)
@@ -0,0 +1,131 @@
+"""
+历史记录和收藏的 NDJSON 导入导出，每行一条：{"kind": "history"|"favorite", "type": "txt2img", "item": {...}}
+
+命令行（在插件根目录执行，导入时请先关闭 webui，否则正在运行的 webui 会用内存中的数据覆盖导入结果）：
+    python -m scripts.physton_prompt.history_transfer export histories.ndjson
+    python -m scripts.physton_prompt.history_transfer import histories.ndjson --batch-size 1000
+"""
+import json
+from scripts.physton_prompt.history import History
+
+kinds = ['history', 'favorite']
+
+
+def export_lines(history, kind=None, type=None):
+    """
+    逐行生成 NDJSON，kind/type 为 None 时导出全部
+    """
+    for item_kind in ([kind] if kind else kinds):
+        for item_type in ([type] if type else history.types):
+            if item_kind == 'history':
+                items = history.iter_histories(item_type)
+            else:
+                items = history.iter_favorites(item_type)
+            for item in items:
+                yield json.dumps({'kind': item_kind, 'type': item_type, 'item': item}, ensure_ascii=False) + '\n'
+
+
+class HistoryImporter:
+    """
+    逐行导入 NDJSON，每个 kind/type 攒够 batch_size 条后写入一次存储，最后调用 finish 写入剩余的记录
+    """
+
+    def __init__(self, history, batch_size=1000):
+        self.history = history
+        self.batch_size = max(1, batch_size)
+        self.batches = {}
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.buffer = b''
+
+    def feed(self, chunk):
+        """
+        导入一段字节流，可以在任意位置截断，不完整的最后一行会留到下一次
+        """
+        self.buffer += chunk
+        lines = self.buffer.split(b'\n')
+        self.buffer = lines.pop()
+        for line in lines:
+            self.add_line(line)
+
+    def add_line(self, line):
+        if not line.strip():
+            return
+        try:
+            data = json.loads(line)
+            kind = data['kind']
+            type = data['type']
+            item = data['item']
+            if kind not in kinds or type not in self.history.types or not isinstance(item, dict):
+                raise ValueError()
+        except Exception:
+            self.invalid += 1
+            return
+        batch = self.batches.setdefault((kind, type), [])
+        batch.append(item)
+        if len(batch) >= self.batch_size:
+            self.__apply(kind, type)
+
+    def __apply(self, kind, type):
+        items = self.batches.pop((kind, type), [])
+        if not items:
+            return
+        if kind == 'history':
+            imported, skipped = self.history.import_histories(type, items)
+        else:
+            imported, skipped = self.history.import_favorites(type, items)
+        self.imported += imported
+        self.skipped += skipped
+
+    def finish(self):
+        if self.buffer:
+            self.add_line(self.buffer)
+            self.buffer = b''
+        for kind, type in list(self.batches.keys()):
+            self.__apply(kind, type)
+        self.history.flush_tag_stats()
+        return self.stats()
+
+    def stats(self):
+        return {'imported': self.imported, 'skipped': self.skipped, 'invalid': self.invalid}
+
+
+def main():
+    import sys
+    import argparse
+    from scripts.physton_prompt.storage import Storage
+
+    parser = argparse.ArgumentParser(description='Export or import prompt histories and favorites as NDJSON')
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('file', help='NDJSON file, "-" for stdout/stdin')
+    parser.add_argument('--kind', choices=kinds, default=None, help='export only this kind')
+    parser.add_argument('--type', choices=History.types, default=None, help='export only this type')
+    parser.add_argument('--namespace', default='')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    history = History(args.namespace)
+    if args.action == 'export':
+        output = sys.stdout if args.file == '-' else open(args.file, 'w', encoding='utf-8')
+        try:
+            for line in export_lines(history, args.kind, args.type):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    else:
+        importer = HistoryImporter(history, args.batch_size)
+        input = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+        try:
+            for line in input:
+                importer.add_line(line)
+        finally:
+            if input is not sys.stdin.buffer:
+                input.close()
+        print(json.dumps(importer.finish()))
+    Storage.flush()
+
+
+if __name__ == '__main__':
+    main()
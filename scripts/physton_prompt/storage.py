@@ -1,16 +1,37 @@
 import os
-import json
-import time
+import re
+import atexit
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from scripts.physton_prompt.storage_engine.file_engine import FileStorageEngine
+from scripts.physton_prompt.storage_engine.sqlite_engine import SqliteStorageEngine
+from scripts.physton_prompt.storage_engine.read_cache import read_cache
+from scripts.physton_prompt.storage_engine.write_behind import WriteBehindEngine
+
+engines = {
+    'file': FileStorageEngine,
+    'sqlite': SqliteStorageEngine,
+}
 
 
 class Storage:
     storage_path = ''
-
-    def __init__():
-        Storage.__dispose_all_locks()
+    engine = None
+    engine_name = 'file'
+    write_behind = 0
+    # 多用户部署时每个命名空间单独一个存储目录，只保留最近使用的引擎
+    namespace = contextvars.ContextVar('physton_prompt_storage_namespace', default='')
+    namespace_engines = OrderedDict()
+    namespace_engines_lock = threading.RLock()
+    max_namespace_engines = int(os.environ.get('PHYSTON_PROMPT_STORAGE_MAX_NAMESPACES', '256'))
 
     def __get_storage_path():
-        Storage.storage_path = os.path.dirname(os.path.abspath(__file__)) + '/../../storage'
+        Storage.storage_path = os.environ.get('PHYSTON_PROMPT_STORAGE_PATH', '')
+        if not Storage.storage_path:
+            Storage.storage_path = os.path.dirname(os.path.abspath(__file__)) + '/../../storage'
         Storage.storage_path = os.path.normpath(Storage.storage_path)
         if not os.path.exists(Storage.storage_path):
             os.makedirs(Storage.storage_path)
@@ -28,161 +49,159 @@ class Storage:
 
         return Storage.storage_path
 
-    def __get_data_filename(key):
-        return Storage.__get_storage_path() + '/' + key + '.json'
-
-    def __get_key_lock_filename(key):
-        return Storage.__get_storage_path() + '/' + key + '.lock'
-
-    def __dispose_all_locks():
-        directory = Storage.__get_storage_path()
-        for filename in os.listdir(directory):
-            # 检查文件是否以指定后缀结尾
-            if filename.endswith('.lock'):
-                file_path = os.path.join(directory, filename)
-                try:
-                    os.remove(file_path)
-                    print(f"Disposed lock: {file_path}")
-                except Exception as e:
-                    print(f"Dispose lock {file_path} failed: {e}")
-
-    def __lock(key):
-        file_path = Storage.__get_key_lock_filename(key)
-        with open(file_path, 'w') as f:
-            f.write('1')
-
-    def __unlock(key):
-        file_path = Storage.__get_key_lock_filename(key)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    def __is_locked(key):
-        file_path = Storage.__get_key_lock_filename(key)
-        return os.path.exists(file_path)
-
-    def __get(key):
-        filename = Storage.__get_data_filename(key)
-        if not os.path.exists(filename):
-            return None
-        if os.path.getsize(filename) == 0:
-            return None
+    # 存储引擎可以通过环境变量 PHYSTON_PROMPT_STORAGE_ENGINE 切换，默认为 file
+    def get_engine(namespace=None):
+        """
+        namespace: 为 None 时使用当前请求的命名空间，见 set_namespace
+        """
+        if Storage.engine is None:
+            Storage.set_engine(os.environ.get('PHYSTON_PROMPT_STORAGE_ENGINE', 'file'))
+        if namespace is None:
+            namespace = Storage.namespace.get()
+        if not namespace:
+            return Storage.engine
+        with Storage.namespace_engines_lock:
+            engine = Storage.namespace_engines.get(namespace)
+            if engine is not None:
+                Storage.namespace_engines.move_to_end(namespace)
+                return engine
+            engine = Storage.__create_engine(Storage.__get_namespace_path(namespace))
+            Storage.namespace_engines[namespace] = engine
+            evicted = []
+            while len(Storage.namespace_engines) > Storage.max_namespace_engines:
+                evicted.append(Storage.namespace_engines.popitem(last=False)[1])
+        for item in evicted:
+            Storage.__close_engine(item)
+        return engine
+
+    def set_engine(name, write_behind=None):
+        """
+        write_behind: 延迟合并写入的安静时间（毫秒），0 为关闭。
+                      默认取环境变量 PHYSTON_PROMPT_STORAGE_WRITE_BEHIND，
+                      最长延迟取 PHYSTON_PROMPT_STORAGE_WRITE_BEHIND_MAX_DELAY（毫秒，默认 2000）
+        """
+        if name not in engines:
+            raise Exception(f'Unknown storage engine: {name}')
+        if write_behind is None:
+            write_behind = int(os.environ.get('PHYSTON_PROMPT_STORAGE_WRITE_BEHIND', '0'))
+        with Storage.namespace_engines_lock:
+            closing = list(Storage.namespace_engines.values())
+            Storage.namespace_engines.clear()
+            if Storage.engine is not None:
+                closing.append(Storage.engine)
+            Storage.engine_name = name
+            Storage.write_behind = write_behind
+            Storage.engine = Storage.__create_engine(Storage.__get_storage_path())
+        for engine in closing:
+            Storage.__close_engine(engine)
+        return Storage.engine
+
+    def __create_engine(path):
+        engine = engines[Storage.engine_name](path)
+        if Storage.write_behind > 0:
+            max_delay = int(os.environ.get('PHYSTON_PROMPT_STORAGE_WRITE_BEHIND_MAX_DELAY', '2000'))
+            engine = WriteBehindEngine(engine, Storage.write_behind / 1000, max(Storage.write_behind, max_delay) / 1000)
+        return engine
+
+    def __close_engine(engine):
+        if isinstance(engine, WriteBehindEngine):
+            engine.close()
+
+    def __get_namespace_path(namespace):
+        # 命名空间按哈希前两位分目录存放：storage/namespaces/ab/<namespace>
+        digest = hashlib.sha1(namespace.encode('utf-8')).hexdigest()
+        if not re.match(r'^[A-Za-z0-9_-]{1,64}$', namespace):
+            namespace = 'h_' + digest
+        return os.path.join(Storage.__get_storage_path(), 'namespaces', digest[:2], namespace)
+
+    # 设置当前请求（协程/线程上下文）使用的命名空间，空字符串为默认的全局存储
+    def set_namespace(namespace):
+        return Storage.namespace.set(namespace or '')
+
+    def get_namespace():
+        return Storage.namespace.get()
+
+    @contextmanager
+    def use_namespace(namespace):
+        token = Storage.set_namespace(namespace)
         try:
-            import launch
-            if not launch.is_installed("chardet"):
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-            else:
-                import chardet
-                with open(filename, 'rb') as f:
-                    data = f.read()
-                    encoding = chardet.detect(data).get('encoding')
-                    data = json.loads(data.decode(encoding))
-        except Exception as e:
-            try:
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-            except Exception as e:
-                print(e)
-                return None
-        return data
-
-    def __set(key, data):
-        file_path = Storage.__get_data_filename(key)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4, ensure_ascii=True)
+            yield
+        finally:
+            Storage.namespace.reset(token)
+
+    # 立即写入延迟合并写入中还没写入的数据
+    def flush():
+        with Storage.namespace_engines_lock:
+            items = list(Storage.namespace_engines.values()) + [Storage.engine]
+        for engine in items:
+            if isinstance(engine, WriteBehindEngine):
+                engine.flush()
+
+    # 进程退出时写入并关闭所有还在使用的引擎，被淘汰的引擎在淘汰时已经关闭
+    def close():
+        with Storage.namespace_engines_lock:
+            items = list(Storage.namespace_engines.values()) + [Storage.engine]
+        for engine in items:
+            Storage.__close_engine(engine)
+
+    # 延迟合并写入的统计，未开启时返回 None
+    def get_write_behind_stats():
+        engine = Storage.get_engine()
+        if isinstance(engine, WriteBehindEngine):
+            return engine.stats()
+        return None
+
+    # 文件引擎读缓存的命中统计
+    def get_cache_stats():
+        return read_cache.stats()
+
+    # 当前命名空间的存储目录，用于存放不适合放在 key/value 里的文件
+    def get_path():
+        return Storage.get_engine().path
+
+    def keys():
+        return Storage.get_engine().keys()
 
     def set(key, data):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        try:
-            Storage.__set(key, data)
-            Storage.__unlock(key)
-        except Exception as e:
-            Storage.__unlock(key)
-            raise e
+        Storage.get_engine().set(key, data)
 
     def get(key):
-        return Storage.__get(key)
+        return Storage.get_engine().get(key)
 
-    def delete(key):
-        file_path = Storage.__get_data_filename(key)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # 批量读取，返回 {key: data}
+    def get_many(keys):
+        return Storage.get_engine().get_many(keys)
 
-    def __get_list(key):
-        data = Storage.get(key)
-        if not data:
-            data = []
-        return data
+    # 批量写入，整批只加一次锁
+    def set_many(mapping):
+        Storage.get_engine().set_many(mapping)
+
+    def delete(key):
+        Storage.get_engine().delete(key)
 
     # 向列表中添加元素
     def list_push(key, item):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        try:
-            data = Storage.__get_list(key)
-            data.append(item)
-            Storage.__set(key, data)
-            Storage.__unlock(key)
-        except Exception as e:
-            Storage.__unlock(key)
-            raise e
+        Storage.get_engine().list_push(key, item)
 
     # 从列表中删除和返回最后一个元素
     def list_pop(key):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        try:
-            data = Storage.__get_list(key)
-            item = data.pop()
-            Storage.__set(key, data)
-            Storage.__unlock(key)
-            return item
-        except Exception as e:
-            Storage.__unlock(key)
-            raise e
+        return Storage.get_engine().list_pop(key)
 
     # 从列表中删除和返回第一个元素
     def list_shift(key):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        try:
-            data = Storage.__get_list(key)
-            item = data.pop(0)
-            Storage.__set(key, data)
-            Storage.__unlock(key)
-            return item
-        except Exception as e:
-            Storage.__unlock(key)
-            raise e
+        return Storage.get_engine().list_shift(key)
 
     # 从列表中删除指定元素
     def list_remove(key, index):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        data = Storage.__get_list(key)
-        data.pop(index)
-        Storage.__set(key, data)
-        Storage.__unlock(key)
+        Storage.get_engine().list_remove(key, index)
 
     # 获取列表中指定位置的元素
     def list_get(key, index):
-        data = Storage.__get_list(key)
-        return data[index]
+        return Storage.get_engine().list_get(key, index)
 
     # 清空列表中的所有元素
     def list_clear(key):
-        while Storage.__is_locked(key):
-            time.sleep(0.01)
-        Storage.__lock(key)
-        try:
-            Storage.__set(key, [])
-            Storage.__unlock(key)
-        except Exception as e:
-            Storage.__unlock(key)
-            raise e
+        Storage.get_engine().list_clear(key)
+
+
+atexit.register(Storage.close)
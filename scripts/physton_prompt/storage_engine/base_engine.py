@@ -0,0 +1,67 @@
+import os
+from abc import ABC, abstractmethod
+
+
+class BaseStorageEngine(ABC):
+    name = None
+    path = ''
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    @abstractmethod
+    def keys(self):
+        pass
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, data):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    # 批量读取，返回 {key: data}
+    def get_many(self, keys):
+        return {key: self.get(key) for key in keys}
+
+    # 批量写入
+    def set_many(self, mapping):
+        for key, data in mapping.items():
+            self.set(key, data)
+
+    # 向列表中添加元素
+    @abstractmethod
+    def list_push(self, key, item):
+        pass
+
+    # 从列表中删除和返回最后一个元素
+    @abstractmethod
+    def list_pop(self, key):
+        pass
+
+    # 从列表中删除和返回第一个元素
+    @abstractmethod
+    def list_shift(self, key):
+        pass
+
+    # 从列表中删除指定元素
+    @abstractmethod
+    def list_remove(self, key, index):
+        pass
+
+    # 获取列表中指定位置的元素
+    @abstractmethod
+    def list_get(self, key, index):
+        pass
+
+    # 清空列表中的所有元素
+    @abstractmethod
+    def list_clear(self, key):
+        pass
@@ -0,0 +1,337 @@
+import os
+import copy
+import json
+import time
+import locale
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from scripts.physton_prompt.storage_engine.base_engine import BaseStorageEngine
+from scripts.physton_prompt.storage_engine.read_cache import read_cache
+from scripts.physton_prompt.storage_engine.list_journal import ListJournal
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+not_cached = object()
+
+# 所有命名空间的引擎共用一个读取线程池，第一次并行读取时创建
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        with executor_lock:
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='physton_prompt_storage')
+    return executor
+
+
+class FileStorageEngine(BaseStorageEngine):
+    name = 'file'
+    # 日志超过该字节数（并且超过快照本身大小）时在后台压缩
+    compact_threshold = 1024 * 1024
+
+    def __init__(self, path, list_mode=None):
+        """
+        list_mode: json 每次修改都重写整个 .json 文件（默认）；
+                   journal 列表操作追加到 .journal 日志，见 ListJournal。
+                   默认取环境变量 PHYSTON_PROMPT_STORAGE_LIST_MODE
+        """
+        super().__init__(path)
+        self.list_mode = list_mode or os.environ.get('PHYSTON_PROMPT_STORAGE_LIST_MODE', 'json')
+        self.journals = {}
+        self.compacting = set()
+        self.thread_locks = {}
+        self.thread_locks_lock = threading.Lock()
+        self.local = threading.local()
+
+    def __get_data_filename(self, key):
+        return self.path + '/' + key + '.json'
+
+    def __get_key_lock_filename(self, key):
+        return self.path + '/' + key + '.lock'
+
+    def __get_thread_lock(self, key):
+        with self.thread_locks_lock:
+            if key not in self.thread_locks:
+                self.thread_locks[key] = threading.RLock()
+            return self.thread_locks[key]
+
+    @contextmanager
+    def lock(self, key):
+        """
+        同一进程内用 threading 锁，多进程之间用 .lock 文件上的 fcntl/msvcrt 建议锁。
+        进程崩溃时操作系统会自动释放文件锁，不会留下需要清理的死锁。
+        """
+        held = self.local.__dict__.setdefault('held', set())
+        if key in held:
+            # 当前线程已经持有该锁（嵌套调用），同一进程重复 flock 会死锁
+            yield
+            return
+        with self.__get_thread_lock(key):
+            with open(self.__get_key_lock_filename(key), 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                elif msvcrt:
+                    while True:
+                        try:
+                            f.seek(0)
+                            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            pass
+                held.add(key)
+                try:
+                    yield
+                finally:
+                    held.discard(key)
+                    if fcntl:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    elif msvcrt:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def __decode(self, data):
+        # 本扩展写入的文件都是 ASCII/UTF-8，先走快速路径，失败了再用 chardet 检测编码
+        try:
+            return data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            pass
+        try:
+            import chardet
+            encoding = chardet.detect(data).get('encoding')
+            if encoding:
+                return data.decode(encoding)
+        except Exception:
+            pass
+        return data.decode(locale.getpreferredencoding(False))
+
+    def __get(self, key, cached_only=False):
+        """
+        cached_only: 缓存未命中时不读取文件，返回 not_cached
+        """
+        filename = self.__get_data_filename(key)
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        if stat.st_size == 0:
+            return None
+        text = read_cache.get(filename, stat)
+        if text is None and cached_only:
+            return not_cached
+        try:
+            if text is None:
+                with open(filename, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    text = self.__decode(f.read())
+                data = json.loads(text)
+                read_cache.put(filename, stat, text)
+            else:
+                data = json.loads(text)
+        except Exception as e:
+            read_cache.discard(filename)
+            print(e)
+            return None
+        return data
+
+    def __set(self, key, data):
+        # 先写入临时文件并 fsync，再原子替换，读取时不会读到只写了一半的文件
+        file_path = self.__get_data_filename(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=key + '.', suffix='.tmp')
+        try:
+            text = json.dumps(data, indent=4, ensure_ascii=True)
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+                stat = os.fstat(f.fileno())
+            self.__replace(tmp_path, file_path)
+            read_cache.put(file_path, stat, text)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise e
+
+    def __replace(self, src, dst):
+        # Windows 下目标文件正被其它进程读取时 os.replace 会失败，稍后重试
+        for i in range(50):
+            try:
+                os.replace(src, dst)
+                return
+            except PermissionError as e:
+                if os.name != 'nt' or i == 49:
+                    raise e
+                time.sleep(0.01)
+
+    def __get_journal_filename(self, key):
+        return self.path + '/' + key + '.journal'
+
+    def __load_journal(self, key):
+        """
+        读取 key 的列表日志，没有日志时返回 None。调用方需要持有 key 的线程锁
+        """
+        journal = self.journals.get(key)
+        if journal is None:
+            journal = ListJournal(self.__get_journal_filename(key))
+        if not journal.refresh():
+            self.journals.pop(key, None)
+            return None
+        self.journals[key] = journal
+        return journal
+
+    def __open_journal(self, key):
+        """
+        获取 key 的列表日志，不存在时用现有的 .json 文件作为快照创建。调用方需要持有 key 的锁
+        """
+        journal = self.__load_journal(key)
+        if journal is not None:
+            return journal
+        journal = ListJournal(self.__get_journal_filename(key))
+        journal.write_snapshot(self.__get_list(key))
+        file_path = self.__get_data_filename(key)
+        read_cache.discard(file_path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        self.journals[key] = journal
+        return journal
+
+    def __remove_journal(self, key):
+        journal = self.journals.pop(key, None)
+        if journal is None:
+            journal = ListJournal(self.__get_journal_filename(key))
+        journal.remove()
+
+    def __journal_op(self, key, op):
+        with self.lock(key):
+            journal = self.__open_journal(key)
+            item = journal.append(op)
+            if journal.needs_compaction(self.compact_threshold) and key not in self.compacting:
+                self.compacting.add(key)
+                threading.Thread(target=self.__compact, args=(key,), daemon=True).start()
+        return item
+
+    def __compact(self, key):
+        try:
+            with self.lock(key):
+                journal = self.__load_journal(key)
+                if journal is not None and journal.needs_compaction(self.compact_threshold):
+                    journal.write_snapshot(journal.items)
+        except Exception as e:
+            print(f'[sd-webui-prompt-all-in-one] Compact {key} failed: {e}')
+        finally:
+            self.compacting.discard(key)
+
+    def keys(self):
+        keys = []
+        for filename in os.listdir(self.path):
+            if filename.endswith('.json'):
+                keys.append(filename[:-len('.json')])
+            elif filename.endswith('.journal'):
+                keys.append(filename[:-len('.journal')])
+        return keys
+
+    def set(self, key, data):
+        with self.lock(key):
+            if self.list_mode == 'journal' and isinstance(data, list) and self.__load_journal(key) is not None:
+                self.journals[key].write_snapshot(copy.deepcopy(data))
+                return
+            self.__set(key, data)
+            if os.path.exists(self.__get_journal_filename(key)):
+                self.__remove_journal(key)
+
+    def get(self, key, cached_only=False):
+        with self.__get_thread_lock(key):
+            journal = self.__load_journal(key)
+            if journal is not None:
+                return copy.deepcopy(journal.items)
+        return self.__get(key, cached_only)
+
+    def get_many(self, keys):
+        # 先直接返回缓存命中和不存在的 key，其余文件并行读取，在网络文件系统上可以显著减少等待时间
+        datas = {}
+        misses = []
+        for key in dict.fromkeys(keys):
+            data = self.get(key, True)
+            if data is not_cached:
+                misses.append(key)
+            datas[key] = data
+        if len(misses) > 1:
+            datas.update(zip(misses, get_executor().map(self.get, misses)))
+        elif misses:
+            datas[misses[0]] = self.get(misses[0])
+        return datas
+
+    def delete(self, key):
+        with self.lock(key):
+            file_path = self.__get_data_filename(key)
+            read_cache.discard(file_path)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            self.__remove_journal(key)
+
+    def __get_list(self, key):
+        data = self.get(key)
+        if not data:
+            data = []
+        return data
+
+    def list_push(self, key, item):
+        if self.list_mode == 'journal':
+            self.__journal_op(key, {'op': 'push', 'item': copy.deepcopy(item)})
+            return
+        with self.lock(key):
+            data = self.__get_list(key)
+            data.append(item)
+            self.set(key, data)
+
+    def list_pop(self, key):
+        if self.list_mode == 'journal':
+            return self.__journal_op(key, {'op': 'pop'})
+        with self.lock(key):
+            data = self.__get_list(key)
+            item = data.pop()
+            self.set(key, data)
+            return item
+
+    def list_shift(self, key):
+        if self.list_mode == 'journal':
+            return self.__journal_op(key, {'op': 'shift'})
+        with self.lock(key):
+            data = self.__get_list(key)
+            item = data.pop(0)
+            self.set(key, data)
+            return item
+
+    def list_remove(self, key, index):
+        if self.list_mode == 'journal':
+            self.__journal_op(key, {'op': 'remove', 'index': index})
+            return
+        with self.lock(key):
+            data = self.__get_list(key)
+            data.pop(index)
+            self.set(key, data)
+
+    def list_get(self, key, index):
+        with self.__get_thread_lock(key):
+            journal = self.__load_journal(key)
+            if journal is not None:
+                return copy.deepcopy(journal.items[index])
+        data = self.__get_list(key)
+        return data[index]
+
+    def list_clear(self, key):
+        if self.list_mode == 'journal':
+            self.__journal_op(key, {'op': 'clear'})
+            return
+        self.set(key, [])
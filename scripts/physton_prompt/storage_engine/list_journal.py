@@ -0,0 +1,132 @@
+import os
+import json
+import tempfile
+
+
+class ListJournal:
+    """
+    列表的追加式日志（NDJSON），每行一个操作：
+        {"op": "snapshot", "items": [...]}  压缩后的快照，只会出现在第一行
+        {"op": "push", "item": ...}
+        {"op": "pop"} / {"op": "shift"} / {"op": "clear"}
+        {"op": "remove", "index": 0}
+    内存中保留回放后的列表和已读取的字节偏移，其它进程追加的操作只需增量回放。
+    调用方负责加锁。
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.items = []
+        self.offset = 0
+        self.ino = None
+        self.snapshot_bytes = 0
+
+    def __reset(self, ino=None):
+        self.items = []
+        self.offset = 0
+        self.ino = ino
+        self.snapshot_bytes = 0
+
+    def refresh(self):
+        """
+        同步磁盘上的日志，日志文件不存在时返回 False
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            self.__reset()
+            return False
+        if stat.st_ino == self.ino and stat.st_size == self.offset:
+            return True
+        try:
+            with open(self.filename, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                # 文件被压缩替换过，从头回放
+                if stat.st_ino != self.ino or stat.st_size < self.offset:
+                    self.__reset(stat.st_ino)
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+        except FileNotFoundError:
+            self.__reset()
+            return False
+        # 只处理完整的行，其它进程可能正在写入最后一行
+        end = data.rfind(b'\n')
+        if end < 0:
+            return True
+        for line in data[:end + 1].splitlines(keepends=True):
+            if line.strip():
+                op = json.loads(line)
+                if op['op'] == 'snapshot':
+                    self.snapshot_bytes = len(line)
+                self.__apply(op)
+        self.offset += end + 1
+        return True
+
+    def __apply(self, op):
+        name = op['op']
+        if name == 'snapshot':
+            self.items = op['items']
+        elif name == 'push':
+            self.items.append(op['item'])
+        elif name == 'pop':
+            return self.items.pop()
+        elif name == 'shift':
+            return self.items.pop(0)
+        elif name == 'remove':
+            return self.items.pop(op['index'])
+        elif name == 'clear':
+            self.items = []
+        return None
+
+    def append(self, op):
+        """
+        追加一个操作并应用到内存中的列表，返回被删除的元素（如果有）
+        """
+        name = op['op']
+        if name in ['pop', 'shift'] and not self.items:
+            raise IndexError('pop from empty list')
+        if name == 'remove':
+            index = op['index']
+            if index < -len(self.items) or index >= len(self.items):
+                raise IndexError('pop index out of range')
+            op['index'] = index % len(self.items)
+        line = (json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(self.filename, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset += len(line)
+        return self.__apply(op)
+
+    def write_snapshot(self, items):
+        """
+        把整个列表压缩成一行快照，原子替换掉日志文件
+        """
+        line = (json.dumps({'op': 'snapshot', 'items': items}, ensure_ascii=False) + '\n').encode('utf-8')
+        directory = os.path.dirname(self.filename)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.filename) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                ino = os.fstat(f.fileno()).st_ino
+            os.replace(tmp_path, self.filename)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise e
+        self.__reset(ino)
+        self.items = items
+        self.offset = len(line)
+        self.snapshot_bytes = len(line)
+
+    def needs_compaction(self, threshold):
+        # 追加的操作超过阈值并且超过快照本身的大小时才压缩，保证追加的均摊成本为 O(1)
+        appended = self.offset - self.snapshot_bytes
+        return appended > max(threshold, self.snapshot_bytes)
+
+    def remove(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.__reset()
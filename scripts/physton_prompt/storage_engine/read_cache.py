@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+
+
+class ReadCache:
+    """
+    进程级的读缓存：文件名 -> 已解码的 JSON 文本。
+    通过 (st_mtime_ns, st_size, st_ino) 判断文件是否变化，文件没有变化时只需要一次 stat。
+    缓存的是文本而不是解析后的对象，每次读取都会得到新的对象，调用方修改返回值不会污染缓存。
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __signature(self, stat):
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def get(self, filename, stat):
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is None or entry[0] != self.__signature(stat):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(filename)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, filename, stat, text):
+        size = len(text)
+        with self.lock:
+            self.__discard(filename)
+            if size > self.max_bytes:
+                return
+            self.entries[filename] = (self.__signature(stat), text)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def discard(self, filename):
+        with self.lock:
+            self.__discard(filename)
+
+    def __discard(self, filename):
+        entry = self.entries.pop(filename, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+read_cache = ReadCache()
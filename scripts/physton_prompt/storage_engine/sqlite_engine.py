@@ -0,0 +1,185 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from scripts.physton_prompt.storage_engine.base_engine import BaseStorageEngine
+from scripts.physton_prompt.storage_engine.file_engine import FileStorageEngine
+
+
+class SqliteStorageEngine(BaseStorageEngine):
+    name = 'sqlite'
+    db_name = 'storage.sqlite3'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.db_file = os.path.join(self.path, self.db_name)
+        self.local = threading.local()
+        self.__init_db()
+
+    def __connect(self):
+        # sqlite3 的连接不能跨线程使用，每个线程单独一个连接
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def __transaction(self):
+        conn = self.__connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception as e:
+            conn.execute('ROLLBACK')
+            raise e
+
+    def __init_db(self):
+        with self.__transaction() as conn:
+            # 每个 key 一行，列表的每个元素单独一行
+            conn.execute('CREATE TABLE IF NOT EXISTS data (key TEXT PRIMARY KEY, is_list INTEGER NOT NULL DEFAULT 0, value TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS list_items (key TEXT NOT NULL, seq INTEGER NOT NULL, value TEXT NOT NULL, PRIMARY KEY (key, seq)) WITHOUT ROWID')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            migrated = conn.execute("SELECT value FROM meta WHERE name = 'json_migrated'").fetchone()
+        if not migrated:
+            count = self.migrate_from_json(self.path)
+            with self.__transaction() as conn:
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('json_migrated', '1')")
+            if count > 0:
+                print(f'[sd-webui-prompt-all-in-one] Migrated {count} storage keys from {self.path} to {self.db_file}')
+
+    def migrate_from_json(self, directory):
+        """
+        把旧的 storage/*.json 文件导入到数据库中，已经存在的 key 不会被覆盖
+        """
+        file_engine = FileStorageEngine(directory)
+        count = 0
+        with self.__transaction() as conn:
+            for key in file_engine.keys():
+                if conn.execute('SELECT 1 FROM data WHERE key = ?', (key,)).fetchone():
+                    continue
+                self.__set(conn, key, file_engine.get(key))
+                count += 1
+        return count
+
+    def __set(self, conn, key, data):
+        conn.execute('DELETE FROM list_items WHERE key = ?', (key,))
+        if isinstance(data, list):
+            conn.execute('INSERT OR REPLACE INTO data (key, is_list, value) VALUES (?, 1, NULL)', (key,))
+            conn.executemany('INSERT INTO list_items (key, seq, value) VALUES (?, ?, ?)',
+                             [(key, seq, json.dumps(item, ensure_ascii=False)) for seq, item in enumerate(data)])
+        else:
+            conn.execute('INSERT OR REPLACE INTO data (key, is_list, value) VALUES (?, 0, ?)',
+                         (key, json.dumps(data, ensure_ascii=False)))
+
+    def __ensure_list(self, conn, key):
+        row = conn.execute('SELECT is_list, value FROM data WHERE key = ?', (key,)).fetchone()
+        if row and row[0]:
+            return
+        if row and json.loads(row[1]):
+            raise TypeError(f'{key} is not a list')
+        conn.execute('INSERT OR REPLACE INTO data (key, is_list, value) VALUES (?, 1, NULL)', (key,))
+
+    def __find_item(self, conn, key, index):
+        if index >= 0:
+            sql = 'SELECT seq, value FROM list_items WHERE key = ? ORDER BY seq ASC LIMIT 1 OFFSET ?'
+        else:
+            sql = 'SELECT seq, value FROM list_items WHERE key = ? ORDER BY seq DESC LIMIT 1 OFFSET ?'
+            index = -index - 1
+        return conn.execute(sql, (key, index)).fetchone()
+
+    def __take_item(self, conn, key, index, error):
+        row = self.__find_item(conn, key, index)
+        if not row:
+            raise IndexError(error)
+        conn.execute('DELETE FROM list_items WHERE key = ? AND seq = ?', (key, row[0]))
+        return json.loads(row[1])
+
+    def keys(self):
+        return [row[0] for row in self.__connect().execute('SELECT key FROM data')]
+
+    def get(self, key):
+        conn = self.__connect()
+        row = conn.execute('SELECT is_list, value FROM data WHERE key = ?', (key,)).fetchone()
+        if not row:
+            return None
+        if not row[0]:
+            return json.loads(row[1])
+        rows = conn.execute('SELECT value FROM list_items WHERE key = ? ORDER BY seq', (key,))
+        return [json.loads(row[0]) for row in rows]
+
+    def set(self, key, data):
+        with self.__transaction() as conn:
+            self.__set(conn, key, data)
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        datas = {key: None for key in keys}
+        conn = self.__connect()
+        conn.execute('BEGIN')
+        try:
+            self.__get_many(conn, keys, datas)
+        finally:
+            conn.execute('COMMIT')
+        return datas
+
+    def __get_many(self, conn, keys, datas):
+        list_keys = []
+        # SQLite 默认最多 999 个参数，分批查询
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for key, is_list, value in conn.execute(f'SELECT key, is_list, value FROM data WHERE key IN ({placeholders})', chunk):
+                if is_list:
+                    datas[key] = []
+                    list_keys.append(key)
+                else:
+                    datas[key] = json.loads(value)
+        for i in range(0, len(list_keys), 500):
+            chunk = list_keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for key, value in conn.execute(f'SELECT key, value FROM list_items WHERE key IN ({placeholders}) ORDER BY key, seq', chunk):
+                datas[key].append(json.loads(value))
+
+    def set_many(self, mapping):
+        # 整批数据在一个事务里写入，只提交一次
+        with self.__transaction() as conn:
+            for key, data in mapping.items():
+                self.__set(conn, key, data)
+
+    def delete(self, key):
+        with self.__transaction() as conn:
+            conn.execute('DELETE FROM list_items WHERE key = ?', (key,))
+            conn.execute('DELETE FROM data WHERE key = ?', (key,))
+
+    def list_push(self, key, item):
+        with self.__transaction() as conn:
+            self.__ensure_list(conn, key)
+            conn.execute('INSERT INTO list_items (key, seq, value) '
+                         'SELECT ?, COALESCE(MAX(seq), -1) + 1, ? FROM list_items WHERE key = ?',
+                         (key, json.dumps(item, ensure_ascii=False), key))
+
+    def list_pop(self, key):
+        with self.__transaction() as conn:
+            return self.__take_item(conn, key, -1, 'pop from empty list')
+
+    def list_shift(self, key):
+        with self.__transaction() as conn:
+            return self.__take_item(conn, key, 0, 'pop from empty list')
+
+    def list_remove(self, key, index):
+        with self.__transaction() as conn:
+            self.__take_item(conn, key, index, 'pop index out of range')
+
+    def list_get(self, key, index):
+        row = self.__find_item(self.__connect(), key, index)
+        if not row:
+            raise IndexError('list index out of range')
+        return json.loads(row[1])
+
+    def list_clear(self, key):
+        self.set(key, [])
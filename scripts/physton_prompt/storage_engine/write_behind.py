@@ -0,0 +1,253 @@
+import copy
+import time
+import threading
+from scripts.physton_prompt.storage_engine.base_engine import BaseStorageEngine
+
+
+class WriteBehindFlusher:
+    """
+    所有延迟合并写入的引擎共用一个后台线程，每个命名空间一个引擎时线程数不随命名空间数量增长。
+    有引擎注册时启动线程，所有引擎都关闭后线程退出
+    """
+
+    def __init__(self):
+        self.engines = set()
+        self.lock = threading.Condition()
+        self.woken = False
+        self.thread = None
+
+    def register(self, engine):
+        with self.lock:
+            self.engines.add(engine)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name='physton_prompt_write_behind', daemon=True)
+                self.thread.start()
+
+    def unregister(self, engine):
+        with self.lock:
+            self.engines.discard(engine)
+            self.woken = True
+            self.lock.notify_all()
+            # 最后一个引擎关闭时等待线程退出，期间又有引擎注册时线程继续使用
+            thread = self.thread
+            if thread is None or thread is threading.current_thread():
+                return
+            while not self.engines and self.thread is thread:
+                self.lock.wait()
+            if self.thread is thread:
+                return
+        thread.join()
+
+    def wake(self):
+        # 调用方不能持有引擎的锁，后台线程会在持有 self.lock 之外获取引擎的锁
+        with self.lock:
+            self.woken = True
+            self.lock.notify_all()
+
+    def __run(self):
+        while True:
+            with self.lock:
+                if not self.engines:
+                    self.thread = None
+                    self.lock.notify_all()
+                    return
+                engines = list(self.engines)
+                self.woken = False
+            now = time.time()
+            deadline = None
+            for engine in engines:
+                due, next_deadline = engine.due_keys(now)
+                if due:
+                    engine.flush(due)
+                    # 写入期间可能有新的值，下一轮重新计算
+                    next_deadline = now
+                if next_deadline is not None and (deadline is None or next_deadline < deadline):
+                    deadline = next_deadline
+            with self.lock:
+                if not self.woken and self.engines:
+                    self.lock.wait(None if deadline is None else max(0, deadline - time.time()))
+
+
+flusher = WriteBehindFlusher()
+
+
+class WriteBehindEngine(BaseStorageEngine):
+    """
+    延迟合并写入：set 先更新内存中的值，共用的后台线程在 key 安静 quiet_period 秒后只写入最后一次的值，
+    一直有写入的 key 最多延迟 max_delay 秒。读取会先看还没写入的值，进程退出时由 Storage.close 全部写入。
+    """
+    name = 'write_behind'
+
+    def __init__(self, engine, quiet_period=0.2, max_delay=2.0):
+        self.engine = engine
+        self.path = engine.path
+        self.name = engine.name
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        # key -> [data, 第一次写入时间, 最后一次写入时间]
+        self.pending = {}
+        # 正在写入磁盘的值，写入完成前读取仍然以它为准
+        self.flushing = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.logical_writes = 0
+        self.coalesced_writes = 0
+        self.physical_writes = 0
+        self.closed = False
+        flusher.register(self)
+
+    def __deadline(self, first, last):
+        return min(last + self.quiet_period, first + self.max_delay)
+
+    def due_keys(self, now):
+        """
+        返回 (到期需要写入的 key, 其余 key 中最早的到期时间)，供 WriteBehindFlusher 调用
+        """
+        due = []
+        deadline = None
+        with self.lock:
+            for key, (_, first, last) in self.pending.items():
+                key_deadline = self.__deadline(first, last)
+                if key_deadline <= now:
+                    due.append(key)
+                elif deadline is None or key_deadline < deadline:
+                    deadline = key_deadline
+        return due, deadline
+
+    def flush(self, keys=None):
+        """
+        立即写入还没写入的值，keys 为 None 时写入全部
+        """
+        with self.flush_lock:
+            with self.lock:
+                if keys is None:
+                    keys = list(self.pending.keys())
+                batch = {}
+                for key in keys:
+                    if key in self.pending:
+                        batch[key] = self.pending.pop(key)[0]
+                self.flushing.update(batch)
+            if not batch:
+                return
+            try:
+                self.engine.set_many(batch)
+                self.physical_writes += len(batch)
+            except Exception as e:
+                print(f'[sd-webui-prompt-all-in-one] Write storage failed: {e}')
+                # 写入失败时放回队列，除非已经有更新的值
+                with self.lock:
+                    now = time.time()
+                    for key, data in batch.items():
+                        self.pending.setdefault(key, [data, now, now])
+            finally:
+                with self.lock:
+                    for key in batch:
+                        self.flushing.pop(key, None)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        flusher.unregister(self)
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'logical_writes': self.logical_writes,
+                'coalesced_writes': self.coalesced_writes,
+                'physical_writes': self.physical_writes,
+            }
+
+    def __get_pending(self, key):
+        # 返回 (是否有未写入的值, 值)，调用方需要持有 self.lock
+        if key in self.pending:
+            return True, copy.deepcopy(self.pending[key][0])
+        if key in self.flushing:
+            return True, copy.deepcopy(self.flushing[key])
+        return False, None
+
+    def keys(self):
+        with self.lock:
+            pending_keys = list(self.pending.keys())
+        return list(dict.fromkeys(self.engine.keys() + pending_keys))
+
+    def get(self, key):
+        with self.lock:
+            found, data = self.__get_pending(key)
+        if found:
+            return data
+        return self.engine.get(key)
+
+    def get_many(self, keys):
+        datas = {}
+        misses = []
+        with self.lock:
+            for key in keys:
+                found, data = self.__get_pending(key)
+                if found:
+                    datas[key] = data
+                else:
+                    misses.append(key)
+        if misses:
+            datas.update(self.engine.get_many(misses))
+        return {key: datas[key] for key in keys}
+
+    def set(self, key, data):
+        self.set_many({key: data})
+
+    def set_many(self, mapping):
+        mapping = copy.deepcopy(mapping)
+        now = time.time()
+        added = False
+        with self.lock:
+            for key, data in mapping.items():
+                self.logical_writes += 1
+                if key in self.pending:
+                    self.coalesced_writes += 1
+                    self.pending[key][0] = data
+                    self.pending[key][2] = now
+                else:
+                    self.pending[key] = [data, now, now]
+                    added = True
+            # 在锁内检查，close 设置 closed 之前放进队列的值会由 close 写入，之后的在这里立即写入
+            closed = self.closed
+        if closed:
+            self.flush(list(mapping.keys()))
+        elif added:
+            # 已有的 key 再次写入只会推迟到期时间，只有新的 key 需要唤醒后台线程
+            flusher.wake()
+
+    def delete(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+        self.flush([key])
+        self.engine.delete(key)
+
+    # 列表操作直接作用在底层引擎上，先把该 key 还没写入的值写进去
+    def list_push(self, key, item):
+        self.flush([key])
+        self.engine.list_push(key, item)
+
+    def list_pop(self, key):
+        self.flush([key])
+        return self.engine.list_pop(key)
+
+    def list_shift(self, key):
+        self.flush([key])
+        return self.engine.list_shift(key)
+
+    def list_remove(self, key, index):
+        self.flush([key])
+        self.engine.list_remove(key, index)
+
+    def list_get(self, key, index):
+        with self.lock:
+            found, data = self.__get_pending(key)
+        if found:
+            return data[index]
+        return self.engine.list_get(key, index)
+
+    def list_clear(self, key):
+        self.flush([key])
+        self.engine.list_clear(key)
@@ -0,0 +1,96 @@
+import re
+import math
+import heapq
+import time
+
+
+class TagStats:
+    """
+    标签使用次数和按时间衰减的得分，每使用一次得分加 1，之后每过 half_life 秒减半
+    只保存每个标签最后一次使用时的得分和时间，读取时再换算成当前的得分
+    """
+    version = 1
+
+    def __init__(self, half_life):
+        self.half_life = half_life
+        # 标签 -> [使用次数, 最后使用时的得分, 最后使用时间]
+        self.tags = {}
+
+    @staticmethod
+    def normalize(value):
+        """
+        去掉权重语法和大小写的差异，例如 "(Long Hair:1.2)" -> "long hair"
+        """
+        value = str(value).strip().strip('()[]{}').strip()
+        value = re.sub(r':\s*-?\d+(\.\d+)?$', '', value).strip()
+        return value.lower()
+
+    @staticmethod
+    def get_values(tags, prompt=''):
+        """
+        一条记录中用到的标签，跳过禁用的标签，没有 tags 时从 prompt 中按逗号拆分
+        """
+        values = []
+        if tags:
+            for tag in tags:
+                if isinstance(tag, dict):
+                    if tag.get('disabled'):
+                        continue
+                    tag = tag.get('value', '')
+                values.append(tag)
+        elif prompt:
+            values = str(prompt).split(',')
+        values = [TagStats.normalize(value) for value in values]
+        return list(dict.fromkeys(value for value in values if value))
+
+    def __decay(self, seconds):
+        return math.pow(0.5, seconds / self.half_life)
+
+    def add(self, values, timestamp=None, count=1):
+        timestamp = int(timestamp or time.time())
+        for value in values:
+            stat = self.tags.get(value)
+            if stat is None:
+                self.tags[value] = [count, float(count), timestamp]
+                continue
+            stat[0] += count
+            if timestamp >= stat[2]:
+                stat[1] = stat[1] * self.__decay(timestamp - stat[2]) + count
+                stat[2] = timestamp
+            else:
+                # 重建时记录不一定按时间顺序，较早的使用换算到最后使用的时间
+                stat[1] += count * self.__decay(stat[2] - timestamp)
+
+    def top(self, limit=None, now=None):
+        now = int(now or time.time())
+        stats = [
+            {'tag': value, 'count': count, 'score': round(score * self.__decay(max(0, now - last)), 4), 'time': last}
+            for value, (count, score, last) in self.tags.items()
+        ]
+        if limit is None:
+            return sorted(stats, key=lambda stat: stat['score'], reverse=True)
+        return heapq.nlargest(limit, stats, key=lambda stat: stat['score'])
+
+    def to_data(self):
+        # 按列保存，比每个标签一个对象更紧凑
+        values = list(self.tags.keys())
+        return {
+            'version': self.version,
+            'half_life': self.half_life,
+            'tags': values,
+            'counts': [self.tags[value][0] for value in values],
+            'scores': [round(self.tags[value][1], 4) for value in values],
+            'times': [self.tags[value][2] for value in values],
+        }
+
+    @staticmethod
+    def from_data(data, half_life):
+        """
+        读取保存的数据，格式或衰减周期不一致时返回 None，需要重建
+        """
+        if not isinstance(data, dict) or data.get('version') != TagStats.version or data.get('half_life') != half_life:
+            return None
+        stats = TagStats(half_life)
+        for value, count, score, last in zip(data['tags'], data['counts'], data['scores'], data['times']):
+            stats.tags[value] = [count, score, last]
+        return stats
@@ -1,33 +1,30 @@
-import json
-import hashlib
+import os
 from scripts.physton_prompt.get_lang import get_lang
-from scripts.physton_prompt.get_translate_apis import get_translate_apis, unprotected_translate_api_config
-from scripts.physton_prompt.translator.alibaba_translator import AlibabaTranslator
-from scripts.physton_prompt.translator.amazon_translator import AmazonTranslator
-from scripts.physton_prompt.translator.baidu_translator import BaiduTranslator
-from scripts.physton_prompt.translator.deepl_translator import DeeplTranslator
-from scripts.physton_prompt.translator.google_tanslator import GoogleTranslator
-from scripts.physton_prompt.translator.microsoft_translator import MicrosoftTranslator
-from scripts.physton_prompt.translator.openai_translator import OpenaiTranslator
-from scripts.physton_prompt.translator.tencent_translator import TencentTranslator
-from scripts.physton_prompt.translator.translators_translator import TranslatorsTranslator
-from scripts.physton_prompt.translator.yandex_translator import YandexTranslator
-from scripts.physton_prompt.translator.youdao_translator import YoudaoTranslator
-from scripts.physton_prompt.translator.mymemory_translator import MyMemoryTranslator
-from scripts.physton_prompt.translator.niutrans_translator import NiutransTranslator
-from scripts.physton_prompt.translator.caiyun_translator import CaiyunTranslator
-from scripts.physton_prompt.translator.volcengine_translator import VolcengineTranslator
-from scripts.physton_prompt.translator.iflytekV1_translator import IflytekV1Translator
-from scripts.physton_prompt.translator.iflytekV2_translator import IflytekV2Translator
-from scripts.physton_prompt.translator.mbart50_translator import MBart50Translator
+from scripts.physton_prompt.get_translate_apis import get_translate_api, unprotected_translate_api_config
+from scripts.physton_prompt.translator_registry import translator_registry
+from scripts.physton_prompt.translate_cache import translate_cache
+from scripts.physton_prompt.translate_memory import get_translate_memory
+from scripts.physton_prompt.translate_dictionary import translate_dictionary
+from scripts.physton_prompt.translate_key import canonical_text, cache_key, cache_scope
 
-caches = {}
+caches = translate_cache
+# 翻译成功时是否同时缓存反方向的结果（译文 -> 原文），标记为推导的结果，不会覆盖已有的缓存。
+# auto: 按 translate_apis.json 中的 reverse_cache，没有设置时开启，回译有损失的 API（例如 openai）设置为 false；
+# 1: 全部开启；0: 全部关闭
+reverse_cache = os.environ.get('PHYSTON_PROMPT_TRANSLATE_REVERSE_CACHE', 'auto')
+# 是否先查 group_tags 和标签 CSV 组成的本地词典，见 translate_dictionary
+use_dictionary = os.environ.get('PHYSTON_PROMPT_TRANSLATE_DICTIONARY', '1') != '0'
+
+
+def is_reverse_cache_enabled(api_item):
+    if reverse_cache == 'auto':
+        return api_item.get('reverse_cache', True)
+    return reverse_cache == '1'
 
 
 def translate(text, from_lang, to_lang, api, api_config=None):
     if api_config is None:
         api_config = {}
-    global caches
 
     def _translate_result(success, message, translated_text):
         return {
@@ -41,109 +38,96 @@ def translate(text, from_lang, to_lang, api, api_config=None):
         }
 
     def _cache_name(text):
-        cache_name = f'{api}.{from_lang}.{to_lang}.{text}.' + json.dumps(api_config)
-        cache_name = hashlib.md5(cache_name.encode('utf-8')).hexdigest()
-        return cache_name
+        return cache_key(scope, from_lang, to_lang, text)
+
+    def _recall(texts):
+        # 内存缓存没有命中的再查持久化的翻译记忆，查到的放回内存缓存
+        memory = get_translate_memory()
+        if memory is None:
+            return [None for _ in texts]
+        results = memory.get_many(scope, from_lang, to_lang, texts)
+        caches.set_many([(_cache_name(text), result) for text, result in zip(texts, results) if result is not None])
+        return results
 
-    apis = get_translate_apis()
-    find = False
-    for group in apis['apis']:
-        for item in group['children']:
-            if item['key'] == api:
-                find = item
-                break
+    def _remember(items):
+        caches.set_many([(_cache_name(text), translated_text) for text, translated_text in items])
+        reverse = []
+        if from_lang != to_lang and is_reverse_cache_enabled(find):
+            reverse = [(translated_text, text) for text, translated_text in items if translated_text.strip()]
+            caches.set_many([(cache_key(scope, to_lang, from_lang, translated_text), text) for translated_text, text in reverse], True)
+        memory = get_translate_memory()
+        if memory is not None:
+            memory.set_many(scope, from_lang, to_lang, items)
+            memory.set_many(scope, to_lang, from_lang, reverse, True)
+
+    find = get_translate_api(api)
     if not find:
         return _translate_result(False, get_lang('translate_api_not_found'), '')
+    scope = cache_scope(find, api_config)
 
     try:
         texts = []
         if isinstance(text, list):
             if len(text) < 1:
                 return _translate_result(False, get_lang('translate_text_is_empty'), '')
-            for item in text:
-                texts.append(None)
-            for index in range(len(text)):
-                item = text[index]
-                item = item.strip()
-                if item == '':
-                    texts[index] = ''
-                    continue
-                cache_name = _cache_name(item)
-                if cache_name in caches:
-                    texts[index] = caches[cache_name]
-                else:
-                    texts[index] = None
+            items = [item.strip() for item in text]
+            indexes = [index for index in range(len(items)) if items[index] != '']
+            texts = ['' for _ in items]
+            if use_dictionary:
+                local = translate_dictionary.lookup_many(from_lang, to_lang, [items[index] for index in indexes])
+                for index, item in zip(indexes, local):
+                    texts[index] = item
+                indexes = [index for index in indexes if texts[index] is None]
+            cached = caches.get_many([_cache_name(items[index]) for index in indexes])
+            for index, item in zip(indexes, cached):
+                texts[index] = item
+            missing = [index for index in indexes if texts[index] is None]
+            if missing:
+                for index, item in zip(missing, _recall([items[index] for index in missing])):
+                    texts[index] = item
         else:
             text = text.strip()
             if text == '':
                 return _translate_result(False, get_lang('translate_text_is_empty'), '')
-            cache_name = _cache_name(text)
-            if cache_name in caches:
-                return _translate_result(True, '', caches[cache_name])
+            if use_dictionary:
+                local = translate_dictionary.lookup(from_lang, to_lang, text)
+                if local is not None:
+                    return _translate_result(True, '', local)
+            cached = caches.get(_cache_name(text))
+            if cached is None:
+                cached = _recall([text])[0]
+            if cached is not None:
+                return _translate_result(True, '', cached)
 
-        if api == 'google':
-            translator = GoogleTranslator()
-        elif api == 'microsoft':
-            translator = MicrosoftTranslator()
-        elif api == 'openai':
-            translator = OpenaiTranslator()
-        elif api == 'amazon':
-            translator = AmazonTranslator()
-        elif api == 'deepl':
-            translator = DeeplTranslator()
-        elif api == 'baidu':
-            translator = BaiduTranslator()
-        elif api == 'alibaba':
-            translator = AlibabaTranslator()
-        elif api == 'yandex':
-            translator = YandexTranslator()
-        elif api == 'youdao':
-            translator = YoudaoTranslator()
-        elif api == 'tencent':
-            translator = TencentTranslator()
-        elif api == 'myMemory_free' or api == 'myMemory':
-            translator = MyMemoryTranslator()
-        elif api == 'niutrans':
-            translator = NiutransTranslator()
-        elif api == 'caiyun':
-            translator = CaiyunTranslator()
-        elif api == 'volcengine':
-            translator = VolcengineTranslator()
-        elif api == 'iflytekV1':
-            translator = IflytekV1Translator()
-        elif api == 'iflytekV2':
-            translator = IflytekV2Translator()
-        elif api == 'mbart50':
-            translator = MBart50Translator()
-        elif 'type' in find and find['type'] == 'translators':
-            translator = TranslatorsTranslator(api)
-            translator.set_translator(find['translator'])
-        else:
+        # 同一个 API、语言和配置的翻译器只创建一次，见 translator_registry
+        api_config = unprotected_translate_api_config('translate_api.' + api, api_config)
+        translator = translator_registry.get(find, from_lang, to_lang, api_config)
+        if translator is None:
             return _translate_result(False, get_lang('translate_api_not_support'), '')
 
-        translator.set_from_lang(from_lang)
-        translator.set_to_lang(to_lang)
-        translator.set_api_config(unprotected_translate_api_config('translate_api.' + api, api_config))
-
         if isinstance(text, list):
-            translate_texts = []
-            translate_indexes = []
+            # 写法不同但缓存键相同的文本只翻译一次
+            translate_indexes = {}
             for index in range(len(texts)):
-                item = texts[index]
-                if item is None:
-                    translate_indexes.append(index)
-                    translate_texts.append(text[index])
+                if texts[index] is None:
+                    translate_indexes.setdefault(canonical_text(items[index]), []).append(index)
+            translate_indexes = list(translate_indexes.values())
+            translate_texts = [items[same[0]] for same in translate_indexes]
             if len(translate_texts) < 1:
                 return _translate_result(True, '', texts)
             result = translator.translate_batch(translate_texts)
+            results = []
             for index in range(len(result)):
                 item = result[index]
-                texts[translate_indexes[index]] = item
-                caches[_cache_name(translate_texts[index])] = item
+                for same in translate_indexes[index]:
+                    texts[same] = item
+                if isinstance(item, str):
+                    results.append((translate_texts[index], item))
+            _remember(results)
             return _translate_result(True, '', texts)
         else:
             translated_text = translator.translate(text).strip()
-            caches[_cache_name(text)] = translated_text
+            _remember([(text, translated_text)])
             return _translate_result(True, '', translated_text)
     except Exception as e:
         # print(e)
@@ -0,0 +1,144 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class TranslateCache:
+    """
+    进程内的翻译缓存：缓存键 -> 翻译结果，按最近使用淘汰。
+    条数超过 max_entries 或者键和结果的 UTF-8 字节数超过 max_bytes 时淘汰最久没有使用的，为 0 时不限制；
+    ttl 大于 0 时超过 ttl 秒的结果视为不存在。
+    derived 为 True 的结果是从反方向的翻译推导出来的，不会覆盖已有的结果，见 translate 中的 _remember。
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=64 * 1024 * 1024, ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # 键 -> (结果, 过期时间, 字节数, 是否推导)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.derived = 0
+        self.hits = 0
+        self.derived_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[1] and entry[1] <= now:
+            self.__discard(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if entry[3]:
+            self.derived_hits += 1
+        return entry[0]
+
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.__get(key, time.monotonic())
+        return default if value is None else value
+
+    def get_many(self, keys):
+        """
+        批量查询，只加一次锁，返回与 keys 一一对应的列表，没有缓存的为 None
+        """
+        now = time.monotonic()
+        with self.lock:
+            return [self.__get(key, now) for key in keys]
+
+    def __set(self, key, value, expires, derived):
+        if derived and key in self.entries:
+            return
+        self.__discard(key)
+        size = len(key) + len(value.encode('utf-8'))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        self.entries[key] = (value, expires, size, derived)
+        self.bytes += size
+        self.derived += derived
+
+    def __evict(self):
+        while self.entries and (
+                (self.max_entries and len(self.entries) > self.max_entries) or
+                (self.max_bytes and self.bytes > self.max_bytes)):
+            _, (_, _, size, derived) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.derived -= derived
+            self.evictions += 1
+
+    def set(self, key, value, derived=False):
+        self.set_many([(key, value)], derived)
+
+    def set_many(self, items, derived=False):
+        """
+        derived: 为 True 时已经有缓存（包括已过期）的键保持不变
+        """
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        with self.lock:
+            for key, value in items:
+                self.__set(key, value, expires, derived)
+            self.__evict()
+
+    def discard(self, key):
+        with self.lock:
+            self.__discard(key)
+
+    def __discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+            self.derived -= entry[3]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.derived = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'derived': self.derived,
+                'hits': self.hits,
+                'derived_hits': self.derived_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+            }
+
+
+translate_cache = TranslateCache(
+    int(os.environ.get('PHYSTON_PROMPT_TRANSLATE_CACHE_SIZE', '100000')),
+    int(os.environ.get('PHYSTON_PROMPT_TRANSLATE_CACHE_BYTES', str(64 * 1024 * 1024))),
+    float(os.environ.get('PHYSTON_PROMPT_TRANSLATE_CACHE_TTL', '0')),
+)
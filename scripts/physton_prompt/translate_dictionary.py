@@ -0,0 +1,166 @@
+import os
+import re
+import csv
+import time
+import threading
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.csv import get_csvs
+from scripts.physton_prompt.translate_key import canonical_text
+
+group_tags_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../group_tags'))
+
+
+class TranslateDictionary:
+    """
+    本地词典：英文标签 <-> 其他语言，来自 group_tags/<语言>.yaml 和标签 CSV（第一列英文，第二列翻译），
+    只能翻译英文和其他语言之间的单个标签，查不到时再使用翻译 API。
+    每种语言第一次用到时加载，之后每隔 check_interval 秒检查一次文件的修改时间，有变化时重新加载。
+    当前语言（全局设置中的 languageCode）还会使用 group_tags/custom.yaml 和设置中选择的 CSV（tagCompleteFile），
+    其他 CSV 只有文件名中带有语言代码（例如 zh_CN、zh-CN）时才会使用。
+    """
+    check_interval = 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 语言 -> (文件签名, 英文 -> 翻译, 翻译 -> 英文)
+        self.languages = {}
+        # 语言 -> 上次检查文件的时间
+        self.checked = {}
+        self.lookups = 0
+        self.served = 0
+        self.loads = 0
+
+    @staticmethod
+    def is_english(lang):
+        return lang == 'en' or lang.startswith('en_')
+
+    @staticmethod
+    def normalize(text):
+        return canonical_text(text).lower()
+
+    def __get_sources(self, lang):
+        sources = []
+        # 词典在所有命名空间之间共享，使用全局存储中的设置
+        with Storage.use_namespace(''):
+            language_code = Storage.get('languageCode')
+            tag_complete_file = Storage.get('tagCompleteFile') if language_code == lang else None
+        for name in ([lang, 'custom'] if language_code == lang else [lang]):
+            path = os.path.join(group_tags_dir, name + '.yaml')
+            if os.path.exists(path):
+                sources.append(('yaml', path))
+        pattern = re.compile(r'(?<![a-z])' + re.escape(lang.lower()).replace('_', '[_-]') + r'(?![a-z])')
+        for item in get_csvs():
+            if item['key'] == tag_complete_file or pattern.search(item['name'].lower()):
+                sources.append(('csv', item['path']))
+        return sources
+
+    def __get_signature(self, sources):
+        signature = []
+        for kind, path in sources:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def __read_yaml(self, path):
+        try:
+            import yaml
+        except ImportError:
+            print(f'[sd-webui-prompt-all-in-one] PyYAML is not installed, skip {path}')
+            return
+        with open(path, 'r', encoding='utf8') as f:
+            data = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        for item in data or []:
+            if not isinstance(item, dict):
+                continue
+            for group in item.get('groups') or []:
+                if not isinstance(group, dict) or not isinstance(group.get('tags'), dict):
+                    continue
+                for en, local in group['tags'].items():
+                    yield en, local
+
+    def __read_csv(self, path):
+        with open(path, 'r', encoding='utf-8-sig', errors='ignore', newline='') as f:
+            for row in csv.reader(f):
+                # 标签补全的 CSV 第二列是标签类型的数字，不是翻译
+                if len(row) >= 2 and not row[1].strip().isdigit():
+                    yield row[0], row[1]
+
+    def __load(self, sources):
+        to_local = {}
+        to_en = {}
+        for kind, path in sources:
+            try:
+                pairs = self.__read_yaml(path) if kind == 'yaml' else self.__read_csv(path)
+                for en, local in pairs:
+                    if en is None or local is None:
+                        continue
+                    en = str(en).strip()
+                    local = str(local).strip()
+                    if not en or not local:
+                        continue
+                    # 同一个标签出现多次时以先读到的为准，custom.yaml 和 CSV 不会覆盖 <语言>.yaml
+                    to_local.setdefault(self.normalize(en), local)
+                    to_en.setdefault(self.normalize(local), en)
+            except Exception as e:
+                print(f'[sd-webui-prompt-all-in-one] Load translate dictionary {path} error: {e}')
+        return to_local, to_en
+
+    def __get_language(self, lang):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.languages.get(lang)
+            if entry is not None and now - self.checked.get(lang, 0) < self.check_interval:
+                return entry
+            self.checked[lang] = now
+        sources = self.__get_sources(lang)
+        signature = self.__get_signature(sources)
+        if entry is not None and entry[0] == signature:
+            return entry
+        to_local, to_en = self.__load(sources)
+        entry = (signature, to_local, to_en)
+        with self.lock:
+            self.languages[lang] = entry
+            self.loads += 1
+        return entry
+
+    def lookup_many(self, from_lang, to_lang, texts):
+        """
+        返回与 texts 一一对应的列表，词典中没有的为 None
+        """
+        mapping = None
+        if self.is_english(from_lang) and not self.is_english(to_lang):
+            mapping = self.__get_language(to_lang)[1]
+        elif self.is_english(to_lang) and not self.is_english(from_lang):
+            mapping = self.__get_language(from_lang)[2]
+        if mapping:
+            results = [mapping.get(self.normalize(text)) for text in texts]
+        else:
+            results = [None for _ in texts]
+        served = sum(1 for result in results if result is not None)
+        with self.lock:
+            self.lookups += len(texts)
+            self.served += served
+        return results
+
+    def lookup(self, from_lang, to_lang, text):
+        return self.lookup_many(from_lang, to_lang, [text])[0]
+
+    def reload(self):
+        with self.lock:
+            self.languages = {}
+            self.checked = {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'lookups': self.lookups,
+                'served': self.served,
+                'loads': self.loads,
+                'languages': {lang: len(entry[1]) for lang, entry in self.languages.items()},
+            }
+
+
+translate_dictionary = TranslateDictionary()
@@ -0,0 +1,53 @@
+import re
+import json
+import hashlib
+
+
+def canonical_text(text):
+    """
+    同一个标签的不同写法使用同一个缓存：
+    下划线视为空格，连续空白合并为一个空格并去掉首尾空白，数字和后面的字母之间的空格去掉（"1 girl" -> "1girl"）
+    """
+    text = str(text).replace('_', ' ')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return re.sub(r'(?<!\w)(\d+) (?=[^\W\d_])', r'\1', text)
+
+
+def config_fingerprint(api_item, api_config):
+    """
+    只取 translate_apis.json 中定义了的、不是密钥（privacy）的配置，没有填写的取默认值，
+    更换密钥或者配置的顺序不同时缓存仍然有效
+    """
+    config = {}
+    for item in api_item.get('config', []) or []:
+        if item.get('privacy'):
+            continue
+        value = (api_config or {}).get(item['key'], None)
+        if value is None or value == '':
+            value = item.get('default', '')
+        config[item['key']] = value
+    return json.dumps(config, sort_keys=True, ensure_ascii=False)
+
+
+def cache_scope(api_item, api_config=None):
+    """
+    缓存所属的 API，例如 "google"、"openai@v2#1a2b3c4d"：
+    接口返回的结果有变化时修改 translate_apis.json 中的 cache_version 让旧的缓存失效；
+    配置与默认值不同（例如换了 openai 的 model）时加上配置的哈希
+    """
+    scope = api_item['key']
+    version = api_item.get('cache_version', 1)
+    if version != 1:
+        scope += f'@v{version}'
+    fingerprint = config_fingerprint(api_item, api_config)
+    if fingerprint != config_fingerprint(api_item, None):
+        scope += '#' + hashlib.md5(fingerprint.encode('utf-8')).hexdigest()[:8]
+    return scope
+
+
+def cache_key(scope, from_lang, to_lang, text):
+    """
+    scope: cache_scope 的返回值，批量生成时只需要计算一次
+    """
+    key = '\n'.join([scope, from_lang, to_lang, canonical_text(text)])
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
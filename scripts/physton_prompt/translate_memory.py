@@ -0,0 +1,336 @@
+"""
+持久化的翻译记忆，保存在 SQLite 中，重启和多个 webui 进程之间共享，按 (api, from_lang, to_lang, 原文) 查询，
+api 为 translate_key.cache_scope，原文为 translate_key.canonical_text。
+数据库默认为存储目录下的 translate_memory.sqlite3，可以通过环境变量 PHYSTON_PROMPT_TRANSLATE_MEMORY_PATH 修改，
+PHYSTON_PROMPT_TRANSLATE_MEMORY=0 关闭。导入导出格式为 NDJSON，每行一条：
+{"api": "google", "from_lang": "en_US", "to_lang": "zh_CN", "text": "1girl", "translated_text": "1个女孩", "derived": false}
+derived 为 true 的记录是从反方向的翻译推导出来的，不会覆盖已有的记录，直接翻译的结果会覆盖推导的记录。
+
+命令行（在插件根目录执行）：
+    python -m scripts.physton_prompt.translate_memory export translate_memory.ndjson
+    python -m scripts.physton_prompt.translate_memory import translate_memory.ndjson
+    python -m scripts.physton_prompt.translate_memory compact --max-entries 100000
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from scripts.physton_prompt.translate_key import canonical_text
+
+fields = ['api', 'from_lang', 'to_lang', 'text', 'translated_text']
+
+
+class TranslateMemory:
+    db_name = 'translate_memory.sqlite3'
+    # 命中时不立即写库，攒够这么多条后再一起更新最后使用时间
+    touch_batch = 256
+
+    def __init__(self, db_file, max_entries=200000):
+        """
+        max_entries: 超过这么多条时按最后使用时间删除最旧的，删到 max_entries 的 90%，为 0 时不限制
+        """
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # (api, from_lang, to_lang, text) -> 最后使用时间（毫秒）
+        self.touched = {}
+        self.inserted = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.__init_db()
+
+    @staticmethod
+    def normalize(text):
+        return canonical_text(text)
+
+    def __connect(self):
+        # sqlite3 的连接不能跨线程使用，每个线程单独一个连接；fork 出的子进程也要重新连接
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            # 只对新建的数据库生效，必须在切换 WAL 之前设置，压缩后才能把空闲页还给文件系统
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def __transaction(self):
+        conn = self.__connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception as e:
+            conn.execute('ROLLBACK')
+            raise e
+
+    def __init_db(self):
+        directory = os.path.dirname(self.db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        with self.__transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS memory ('
+                         'api TEXT NOT NULL, from_lang TEXT NOT NULL, to_lang TEXT NOT NULL, text TEXT NOT NULL, '
+                         'translated_text TEXT NOT NULL, created_at INTEGER NOT NULL, used_at INTEGER NOT NULL, '
+                         'derived INTEGER NOT NULL DEFAULT 0, '
+                         'PRIMARY KEY (api, from_lang, to_lang, text)) WITHOUT ROWID')
+            conn.execute('CREATE INDEX IF NOT EXISTS memory_used_at ON memory (used_at)')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(memory)')]
+            if 'derived' not in columns:
+                conn.execute('ALTER TABLE memory ADD COLUMN derived INTEGER NOT NULL DEFAULT 0')
+
+    def get_many(self, api, from_lang, to_lang, texts):
+        """
+        返回与 texts 一一对应的列表，没有记录的为 None；数据库出错时当作没有记录
+        """
+        texts = [self.normalize(text) for text in texts]
+        found = {}
+        try:
+            conn = self.__connect()
+            unique = list(dict.fromkeys(texts))
+            # SQLite 默认最多 999 个参数，分批查询
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                sql = f'SELECT text, translated_text FROM memory WHERE api = ? AND from_lang = ? AND to_lang = ? AND text IN ({placeholders})'
+                for text, translated_text in conn.execute(sql, [api, from_lang, to_lang] + chunk):
+                    found[text] = translated_text
+        except Exception as e:
+            self.errors += 1
+            print(f'[sd-webui-prompt-all-in-one] Translate memory read error: {e}')
+        results = [found.get(text) for text in texts]
+        now = int(time.time() * 1000)
+        flush = False
+        with self.lock:
+            for text in found:
+                self.touched[(api, from_lang, to_lang, text)] = now
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+            flush = len(self.touched) >= self.touch_batch
+        if flush:
+            self.flush()
+        return results
+
+    def get(self, api, from_lang, to_lang, text):
+        return self.get_many(api, from_lang, to_lang, [text])[0]
+
+    def set_many(self, api, from_lang, to_lang, items, derived=False):
+        """
+        items: [(原文, 译文)]，已经存在的记录会被覆盖；derived 为 True 时已经存在的记录保持不变
+        """
+        now = int(time.time() * 1000)
+        rows = [(api, from_lang, to_lang, self.normalize(text), translated_text, now, now, int(derived))
+                for text, translated_text in items if isinstance(translated_text, str) and self.normalize(text)]
+        return self.__insert(rows)
+
+    def set(self, api, from_lang, to_lang, text, translated_text, derived=False):
+        return self.set_many(api, from_lang, to_lang, [(text, translated_text)], derived)
+
+    def __insert(self, rows):
+        if not rows:
+            return 0
+        try:
+            with self.__transaction() as conn:
+                conn.executemany('INSERT INTO memory (api, from_lang, to_lang, text, translated_text, created_at, used_at, derived) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (api, from_lang, to_lang, text) DO UPDATE SET '
+                                 'translated_text = excluded.translated_text, used_at = MAX(used_at, excluded.used_at), derived = 0 '
+                                 'WHERE excluded.derived = 0', rows)
+        except Exception as e:
+            self.errors += 1
+            print(f'[sd-webui-prompt-all-in-one] Translate memory write error: {e}')
+            return 0
+        with self.lock:
+            self.inserted += len(rows)
+            # 新写入的数量超过上限的 10% 时检查一次是否需要压缩，不用每次都 COUNT
+            compact = self.max_entries and self.inserted >= max(1, self.max_entries // 10)
+            if compact:
+                self.inserted = 0
+        if compact:
+            self.compact()
+        return len(rows)
+
+    def flush(self):
+        """
+        把命中时记录的最后使用时间写入数据库
+        """
+        with self.lock:
+            touched = self.touched
+            self.touched = {}
+        if not touched:
+            return
+        try:
+            with self.__transaction() as conn:
+                conn.executemany('UPDATE memory SET used_at = MAX(used_at, ?) WHERE api = ? AND from_lang = ? AND to_lang = ? AND text = ?',
+                                 [(used_at,) + key for key, used_at in touched.items()])
+        except Exception as e:
+            self.errors += 1
+            print(f'[sd-webui-prompt-all-in-one] Translate memory write error: {e}')
+
+    def compact(self, max_entries=None):
+        """
+        超过 max_entries 条时删除最久没有使用的记录，删到 max_entries 的 90%，返回删除的数量
+        """
+        if max_entries is None:
+            max_entries = self.max_entries
+        if not max_entries:
+            return 0
+        self.flush()
+        try:
+            with self.__transaction() as conn:
+                count = conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+                if count <= max_entries:
+                    return 0
+                deleted = count - int(max_entries * 0.9)
+                # 表没有 rowid，按主键删除
+                conn.execute('DELETE FROM memory WHERE (api, from_lang, to_lang, text) IN '
+                             '(SELECT api, from_lang, to_lang, text FROM memory ORDER BY used_at LIMIT ?)', (deleted,))
+            self.__vacuum()
+            return deleted
+        except Exception as e:
+            self.errors += 1
+            print(f'[sd-webui-prompt-all-in-one] Translate memory compact error: {e}')
+            return 0
+
+    def __vacuum(self):
+        # execute 只执行一步、只释放一页，executescript 才会执行完；检查点之后数据库文件才会变小
+        conn = self.__connect()
+        conn.executescript('PRAGMA incremental_vacuum')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+
+    def export_lines(self):
+        """
+        逐行生成 NDJSON，按最后使用时间从新到旧，导入时如果设置了上限会优先保留常用的
+        """
+        self.flush()
+        sql = 'SELECT api, from_lang, to_lang, text, translated_text, derived FROM memory ORDER BY used_at DESC'
+        for row in self.__connect().execute(sql):
+            data = dict(zip(fields, row))
+            data['derived'] = bool(row[-1])
+            yield json.dumps(data, ensure_ascii=False) + '\n'
+
+    def import_lines(self, lines, batch_size=1000):
+        """
+        导入 NDJSON，已经存在的记录按 set_many 的规则覆盖，返回 {imported, invalid}
+        """
+        now = int(time.time() * 1000)
+        rows = []
+        imported = 0
+        invalid = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                row = tuple(data[field] for field in fields)
+                if not all(isinstance(value, str) for value in row) or not self.normalize(row[3]):
+                    raise ValueError()
+            except Exception:
+                invalid += 1
+                continue
+            rows.append(row[:3] + (self.normalize(row[3]), row[4], now, now, int(bool(data.get('derived', False)))))
+            if len(rows) >= batch_size:
+                imported += self.__insert(rows)
+                rows = []
+        imported += self.__insert(rows)
+        return {'imported': imported, 'invalid': invalid}
+
+    def clear(self):
+        with self.lock:
+            self.touched = {}
+        with self.__transaction() as conn:
+            conn.execute('DELETE FROM memory')
+        self.__vacuum()
+
+    def stats(self):
+        try:
+            entries, derived = self.__connect().execute('SELECT COUNT(*), COALESCE(SUM(derived), 0) FROM memory').fetchone()
+        except Exception:
+            entries, derived = None, None
+        with self.lock:
+            return {
+                'entries': entries,
+                'derived': derived,
+                'bytes': os.path.getsize(self.db_file) if os.path.exists(self.db_file) else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'max_entries': self.max_entries,
+            }
+
+
+translate_memory = None
+translate_memory_lock = threading.Lock()
+# 数据库打不开时不再重试，翻译记忆只是缓存，不能影响翻译
+translate_memory_failed = False
+
+
+def get_translate_memory():
+    """
+    第一次使用时才打开数据库，关闭或者打不开时返回 None
+    """
+    global translate_memory, translate_memory_failed
+    if os.environ.get('PHYSTON_PROMPT_TRANSLATE_MEMORY', '1') == '0':
+        return None
+    if translate_memory is None and not translate_memory_failed:
+        with translate_memory_lock:
+            if translate_memory is None and not translate_memory_failed:
+                db_file = None
+                try:
+                    from scripts.physton_prompt.storage import Storage
+                    db_file = os.environ.get('PHYSTON_PROMPT_TRANSLATE_MEMORY_PATH', '')
+                    if not db_file:
+                        db_file = os.path.join(Storage.get_engine('').path, TranslateMemory.db_name)
+                    max_entries = int(os.environ.get('PHYSTON_PROMPT_TRANSLATE_MEMORY_SIZE', '200000'))
+                    translate_memory = TranslateMemory(db_file, max_entries)
+                except Exception as e:
+                    translate_memory_failed = True
+                    print(f'[sd-webui-prompt-all-in-one] Open translate memory {db_file} failed, translate memory is disabled: {e}')
+    return translate_memory
+
+
+def main():
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export, import or compact the persistent translation memory')
+    parser.add_argument('action', choices=['export', 'import', 'compact'])
+    parser.add_argument('file', nargs='?', default='-', help='NDJSON file, "-" for stdout/stdin')
+    parser.add_argument('--max-entries', type=int, default=None, help='compact down to this many entries')
+    args = parser.parse_args()
+
+    memory = get_translate_memory()
+    if memory is None:
+        if translate_memory_failed:
+            # 打不开的原因 get_translate_memory 已经输出
+            sys.exit('Translate memory could not be opened')
+        print('Translate memory is disabled by PHYSTON_PROMPT_TRANSLATE_MEMORY=0')
+        return
+    if args.action == 'export':
+        output = sys.stdout if args.file == '-' else open(args.file, 'w', encoding='utf-8')
+        try:
+            for line in memory.export_lines():
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    elif args.action == 'import':
+        input = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+        try:
+            print(json.dumps(memory.import_lines(input)))
+        finally:
+            if input is not sys.stdin.buffer:
+                input.close()
+    else:
+        print(json.dumps({'deleted': memory.compact(args.max_entries)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.history import History
+from scripts.physton_prompt.get_group_tags import get_group_tags
+from scripts.physton_prompt.get_translate_apis import get_translate_api, get_translate_api_group
+from scripts.physton_prompt.translate import translate
+from scripts.physton_prompt.translate_dictionary import translate_dictionary, TranslateDictionary
+
+
+class TranslateWarmUp:
+    """
+    启动后在后台把分组标签和历史记录中最常用的标签翻译成当前语言，写入翻译缓存和翻译记忆。
+    使用全局设置中的 translateApi 和 languageCode，每批 batch_size 个标签，两批之间至少间隔 interval 秒，
+    本地词典能翻译的和已经缓存的标签不会请求翻译 API，重启后再次预热时已经翻译过的会直接命中翻译记忆。
+    """
+    # 为 0 时启动后不自动预热，仍然可以通过接口手动开始
+    enabled = os.environ.get('PHYSTON_PROMPT_TRANSLATE_WARM_UP', '1') != '0'
+    batch_size = int(os.environ.get('PHYSTON_PROMPT_TRANSLATE_WARM_UP_BATCH', '50'))
+    interval = float(os.environ.get('PHYSTON_PROMPT_TRANSLATE_WARM_UP_INTERVAL', '2'))
+    # 最多预热多少个标签，历史记录中的常用标签排在前面
+    limit = int(os.environ.get('PHYSTON_PROMPT_TRANSLATE_WARM_UP_LIMIT', '5000'))
+    history_top = 500
+    # 连续失败这么多批后停止
+    max_failures = 3
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.resumed = threading.Event()
+        self.resumed.set()
+        self.stopped = threading.Event()
+        self.progress = {'state': 'idle'}
+
+    def __update(self, **fields):
+        with self.lock:
+            self.progress.update(fields)
+
+    def get_progress(self):
+        with self.lock:
+            return dict(self.progress)
+
+    def __get_group_tags(self, lang):
+        try:
+            import yaml
+            data = yaml.load(get_group_tags(lang), Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        except Exception as e:
+            print(f'[sd-webui-prompt-all-in-one] Load group tags for translate warm up failed: {e}')
+            return []
+        tags = []
+        for item in data or []:
+            if not isinstance(item, dict):
+                continue
+            for group in item.get('groups') or []:
+                if isinstance(group, dict) and isinstance(group.get('tags'), dict):
+                    tags += [str(tag) for tag in group['tags'].keys()]
+        return tags
+
+    def __get_history_tags(self):
+        history = History.get_instance('')
+        stats = []
+        for type in history.types:
+            stats += history.get_tag_stats(type, self.history_top)
+        stats.sort(key=lambda stat: stat['score'], reverse=True)
+        return [stat['tag'] for stat in stats[:self.history_top]]
+
+    def collect(self, lang):
+        """
+        需要预热的标签，去重并去掉本地词典能翻译的
+        """
+        tags = list(dict.fromkeys(self.__get_history_tags() + self.__get_group_tags(lang)))
+        local = translate_dictionary.lookup_many('en_US', lang, tags)
+        return [tag for tag, result in zip(tags, local) if result is None][:self.limit]
+
+    def start(self):
+        """
+        在后台线程中开始预热，已经在运行时返回 False
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return False
+            self.stopped.clear()
+            self.resumed.set()
+            self.progress = {'state': 'starting'}
+            self.thread = threading.Thread(target=self.__run, name='physton_prompt_translate_warm_up', daemon=True)
+            self.thread.start()
+        return True
+
+    def pause(self):
+        self.resumed.clear()
+        with self.lock:
+            if self.progress.get('state') == 'running':
+                self.progress['state'] = 'paused'
+
+    def resume(self):
+        with self.lock:
+            if self.progress.get('state') == 'paused':
+                self.progress['state'] = 'running'
+        self.resumed.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.resumed.set()
+
+    def __wait(self, seconds):
+        # 暂停时一直等到继续或者停止，返回 False 表示已经停止
+        deadline = time.monotonic() + seconds
+        while not self.stopped.is_set():
+            self.resumed.wait()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stopped.wait(min(remaining, 0.5)):
+                break
+        return not self.stopped.is_set()
+
+    def __run(self):
+        try:
+            with Storage.use_namespace(''):
+                api = Storage.get('translateApi')
+                lang = Storage.get('languageCode')
+                api_config = Storage.get('translate_api.' + api) if api else None
+            api_item = get_translate_api(api)
+            if not api_item or not lang or TranslateDictionary.is_english(lang):
+                self.__update(state='skipped', api=api, lang=lang, message='no translate API or language to warm up')
+                return
+            if get_translate_api_group(api).get('type') == 'offline_api':
+                # 离线模型在启动时加载太慢，不预热
+                self.__update(state='skipped', api=api, lang=lang, message='offline translate API')
+                return
+            if lang not in api_item.get('support', {}):
+                self.__update(state='skipped', api=api, lang=lang, message='language is not supported by the API')
+                return
+
+            tags = self.collect(lang)
+            self.__update(state='running' if self.resumed.is_set() else 'paused', api=api, lang=lang,
+                          total=len(tags), done=0, failed=0, batches=0, message='',
+                          started_at=int(time.time()), finished_at=None)
+            failures = 0
+            for start in range(0, len(tags), self.batch_size):
+                if not self.__wait(0):
+                    break
+                batch = tags[start:start + self.batch_size]
+                began = time.monotonic()
+                result = translate(batch, 'en_US', lang, api, dict(api_config or {}))
+                with self.lock:
+                    self.progress['batches'] += 1
+                    self.progress['done'] += len(batch)
+                    if not result['success']:
+                        self.progress['failed'] += len(batch)
+                        self.progress['message'] = result['message']
+                if result['success']:
+                    failures = 0
+                else:
+                    failures += 1
+                    if failures >= self.max_failures:
+                        self.__update(state='error', finished_at=int(time.time()))
+                        return
+                if not self.__wait(max(0, self.interval - (time.monotonic() - began))):
+                    break
+            self.__update(state='stopped' if self.stopped.is_set() else 'done', finished_at=int(time.time()))
+        except Exception as e:
+            print(f'[sd-webui-prompt-all-in-one] Translate warm up failed: {e}')
+            self.__update(state='error', message=str(e), finished_at=int(time.time()))
+
+
+translate_warm_up = TranslateWarmUp()
@@ -5,6 +5,8 @@ from scripts.physton_prompt.get_lang import get_lang
 
 
 class AlibabaTranslator(BaseTranslator):
+    client = None
+
     def __init__(self):
         super().__init__('alibaba')
 
@@ -20,14 +22,19 @@ class AlibabaTranslator(BaseTranslator):
             raise Exception(get_lang('is_required', {'0': 'Region ID'}))
         return access_key_id, access_key_secret, region
 
+    def _get_client(self):
+        if self.client is None:
+            access_key_id, access_key_secret, region = self._get_config()
+            from aliyunsdkcore.client import AcsClient
+            self.client = AcsClient(access_key_id, access_key_secret, region)
+        return self.client
+
     def translate(self, text):
         if not text:
             return ''
-        access_key_id, access_key_secret, region = self._get_config()
-        from aliyunsdkcore.client import AcsClient
+        client = self._get_client()
         from aliyunsdkalimt.request.v20181012 import TranslateRequest
 
-        client = AcsClient(access_key_id, access_key_secret, region)
         request = TranslateRequest.TranslateRequest()
         request.set_SourceLanguage(self.from_lang)
         request.set_Scene("general")
@@ -48,8 +55,7 @@ class AlibabaTranslator(BaseTranslator):
     def translate_batch(self, texts):
         if not texts:
             return []
-        access_key_id, access_key_secret, region = self._get_config()
-        from aliyunsdkcore.client import AcsClient
+        client = self._get_client()
         from aliyunsdkalimt.request.v20181012 import GetBatchTranslateRequest
 
         results = []
@@ -69,7 +75,6 @@ class AlibabaTranslator(BaseTranslator):
                 source_texts[str(i)] = group_texts[i]
                 dist_texts[str(i)] = ''
 
-            client = AcsClient(access_key_id, access_key_secret, region)
             request = GetBatchTranslateRequest.GetBatchTranslateRequest()
             request.set_SourceLanguage(self.from_lang)
             request.set_Scene("general")
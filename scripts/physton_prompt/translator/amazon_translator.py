@@ -3,6 +3,8 @@ from scripts.physton_prompt.get_lang import get_lang
 
 
 class AmazonTranslator(BaseTranslator):
+    client = None
+
     def __init__(self):
         super().__init__('amazon')
 
@@ -19,10 +21,11 @@ class AmazonTranslator(BaseTranslator):
         if not region:
             raise Exception(get_lang('is_required', {'0': 'Region'}))
 
-        import boto3
-        translate = boto3.client(service_name='translate', region_name=region, use_ssl=True,
-                                 aws_access_key_id=api_key_id, aws_secret_access_key=api_key_secret)
-        result = translate.translate_text(Text=text, SourceLanguageCode=self.from_lang, TargetLanguageCode=self.to_lang)
+        if self.client is None:
+            import boto3
+            self.client = boto3.client(service_name='translate', region_name=region, use_ssl=True,
+                                       aws_access_key_id=api_key_id, aws_secret_access_key=api_key_secret)
+        result = self.client.translate_text(Text=text, SourceLanguageCode=self.from_lang, TargetLanguageCode=self.to_lang)
         if 'TranslatedText' not in result:
             raise Exception(get_lang('no_response_from', {'0': 'Amazon'}))
         return result['TranslatedText']
@@ -1,5 +1,4 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
-import requests
 import hashlib
 import random
 from scripts.physton_prompt.get_lang import get_lang
@@ -33,7 +32,7 @@ class BaiduTranslator(BaseTranslator):
             'salt': salt,
             'sign': sign
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = self.session.get(url, params=params, timeout=10)
         result = response.json()
         if 'error_code' in result:
             raise Exception(result['error_msg'])
@@ -1,10 +1,11 @@
 import time
+import threading
 from abc import ABC, abstractmethod
 from concurrent.futures import ThreadPoolExecutor
 from math import ceil
 
 from scripts.physton_prompt.get_lang import get_lang
-from scripts.physton_prompt.get_translate_apis import get_translate_apis
+from scripts.physton_prompt.get_translate_apis import get_translate_api
 
 
 class BaseTranslator(ABC):
@@ -16,16 +17,38 @@ class BaseTranslator(ABC):
 
     def __init__(self, api):
         self.api = api
-        apis = get_translate_apis()
-        find = False
-        for group in apis['apis']:
-            for item in group['children']:
-                if item['key'] == api:
-                    find = item
-                    break
+        find = get_translate_api(api)
         if not find:
             raise Exception(get_lang('translate_api_not_support'))
         self.api_item = find
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        同一个翻译器的请求共用一个 requests.Session，复用 HTTP 连接
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    # 分组并发翻译时每个线程一个连接
+                    pool_size = max(10, min(self.get_concurrent(), 100))
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        with self._session_lock:
+            session = self._session
+            self._session = None
+        if session is not None:
+            session.close()
 
     def set_from_lang(self, from_lang):
         from_lang = self.api_item['support'].get(from_lang, False)
@@ -1,6 +1,5 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
 import uuid
-import requests
 import json
 from scripts.physton_prompt.get_lang import get_lang
 
@@ -29,7 +28,7 @@ class CaiyunTranslator(BaseTranslator):
             "x-authorization": "token " + token,
         }
 
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
+        response = self.session.post(url, data=json.dumps(payload), headers=headers)
         if not response.text:
             raise Exception(get_lang('response_is_empty', {'0': 'caiyun'}))
         result = response.json()
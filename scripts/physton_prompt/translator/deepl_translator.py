@@ -1,5 +1,4 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -24,7 +23,7 @@ class DeeplTranslator(BaseTranslator):
             'target_lang': self.to_lang
         }
 
-        response = requests.post(url, headers=headers, data=data, timeout=10)
+        response = self.session.post(url, headers=headers, data=data, timeout=10)
         if response.status_code != 200:
             raise Exception(get_lang('request_error', {'0': 'DeepL'}))
         if not response.text:
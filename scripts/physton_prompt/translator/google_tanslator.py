@@ -1,5 +1,4 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -21,7 +20,7 @@ class GoogleTranslator(BaseTranslator):
             'target': self.to_lang,
             'format': 'text'
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = self.session.get(url, params=params, timeout=10)
         result = response.json()
         if 'error' in result:
             raise Exception(result['error']['message'])
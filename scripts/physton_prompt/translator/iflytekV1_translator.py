@@ -25,7 +25,7 @@ class IflytekV1Translator(BaseTranslator):
         if not api_key:
             raise Exception(get_lang('is_required', {'0': 'API Key'}))
 
-        response = translate(text, From=self.from_lang, To=self.to_lang, APPID=app_id, Secret=api_secret, APIKey=api_key)
+        response = translate(text, From=self.from_lang, To=self.to_lang, APPID=app_id, Secret=api_secret, APIKey=api_key, session=self.session)
         if response.status_code != 200:
             raise Exception(get_lang('request_error', {'0': 'iflytekV1'}))
         if not response.text:
@@ -57,7 +57,7 @@ def httpdate(dt):
     return "%s, %02d %s %04d %02d:%02d:%02d GMT" % (weekday, dt.day, month,
                                                     dt.year, dt.hour, dt.minute, dt.second)
 
-def translate(Text, From, To, APPID, Secret, APIKey, Host="itrans.xfyun.cn"):
+def translate(Text, From, To, APPID, Secret, APIKey, Host="itrans.xfyun.cn", session=requests):
     RequestUri = "/v2/its"
     url="https://"+Host+RequestUri
     HttpMethod = "POST"
@@ -109,5 +109,5 @@ def translate(Text, From, To, APPID, Secret, APIKey, Host="itrans.xfyun.cn"):
         "Authorization": authHeader
     }
 
-    response = requests.post(url, data=body, headers=headers,timeout=60)
+    response = session.post(url, data=body, headers=headers,timeout=60)
     return response
@@ -28,7 +28,7 @@ class IflytekV2Translator(BaseTranslator):
         if not api_key:
             raise Exception(get_lang('is_required', {'0': 'API Key'}))
 
-        response = translate(text, From=self.from_lang, To=self.to_lang, APPId=app_id, APISecret=api_secret, APIKey=api_key)
+        response = translate(text, From=self.from_lang, To=self.to_lang, APPId=app_id, APISecret=api_secret, APIKey=api_key, session=self.session)
         if response.status_code != 200:
             raise Exception(get_lang('request_error', {'0': 'iflytekV1'}))
         if not response.text:
@@ -95,7 +95,7 @@ def assemble_ws_auth_url(requset_url, method="POST", api_key="", api_secret=""):
 
     return requset_url + "?" + urlencode(values)
 
-def translate(Text, From, To, APPId, APISecret, APIKey, Host="itrans.xf-yun.com"):
+def translate(Text, From, To, APPId, APISecret, APIKey, Host="itrans.xf-yun.com", session=requests):
     RequestUri = "/v1/its"
     url="https://"+Host+RequestUri
 
@@ -124,5 +124,5 @@ def translate(Text, From, To, APPId, APISecret, APIKey, Host="itrans.xf-yun.com"
 
     headers = {'content-type': "application/json", 'host': 'itrans.xf-yun.com', 'app_id': APPId}
     # print(request_url)
-    response = requests.post(request_url, data=json.dumps(body), headers=headers)
+    response = session.post(request_url, data=json.dumps(body), headers=headers)
     return response
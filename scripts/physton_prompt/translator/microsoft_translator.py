@@ -1,6 +1,5 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
 import uuid
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -40,7 +39,7 @@ class MicrosoftTranslator(BaseTranslator):
         else:
             body.append({'text': text})
 
-        response = requests.post(url, params=params, headers=headers, json=body, timeout=10)
+        response = self.session.post(url, params=params, headers=headers, json=body, timeout=10)
         result = response.json()
         if 'error' in result:
             raise Exception(result['error']['message'])
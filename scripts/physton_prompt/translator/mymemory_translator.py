@@ -1,6 +1,5 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
 import uuid
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -20,7 +19,7 @@ class MyMemoryTranslator(BaseTranslator):
         if api_key:
             params['key'] = api_key
 
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         if response.status_code != 200:
             raise Exception(get_lang('request_error', {'0': 'myMemory'}))
         if not response.text:
@@ -1,6 +1,5 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
 import uuid
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -22,7 +21,7 @@ class NiutransTranslator(BaseTranslator):
             'src_text': text,
         }
 
-        response = requests.post(url, data=data)
+        response = self.session.post(url, data=data)
         if response.status_code != 200:
             raise Exception(get_lang('request_error', {'0': 'niutrans'}))
         if not response.text:
@@ -4,9 +4,20 @@ from scripts.physton_prompt.get_lang import get_lang
 
 
 class OpenaiTranslator(BaseTranslator):
+    client = None
+
     def __init__(self):
         super().__init__('openai')
 
+    def get_client(self, api_base, api_key):
+        if self.client is None:
+            from openai import OpenAI
+            self.client = OpenAI(
+                base_url=api_base,
+                api_key=api_key,
+            )
+        return self.client
+
     def translate(self, text):
         if not text:
             if isinstance(text, list):
@@ -40,11 +51,7 @@ class OpenaiTranslator(BaseTranslator):
         if LooseVersion(openai.__version__) < LooseVersion('1.0.0'):
             completion = openai.ChatCompletion.create(model=model, messages=messages, timeout=60)
         else:
-            from openai import OpenAI
-            client = OpenAI(
-                base_url=openai.api_base,
-                api_key=openai.api_key,
-            )
+            client = self.get_client(openai.api_base, openai.api_key)
             completion = client.chat.completions.create(model=model, messages=messages, timeout=60)
         if len(completion.choices) == 0:
             raise Exception(get_lang('no_response_from', {'0': 'OpenAI'}))
@@ -4,8 +4,6 @@ import json
 import time
 from datetime import datetime
 
-import requests
-
 from scripts.physton_prompt.get_lang import get_lang
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
 
@@ -37,7 +35,7 @@ class TencentTranslator(BaseTranslator):
             'ProjectId': 0
         }
         res = sign_tencent(secret_id, secret_key, region, params)
-        response = requests.post(res['url'], json=params, timeout=10, headers=res['headers'])
+        response = self.session.post(res['url'], json=params, timeout=10, headers=res['headers'])
         result = response.json()
         if 'Response' not in result:
             raise Exception(get_lang('no_response_from', {'0': 'Tencent'}))
@@ -56,7 +54,7 @@ class TencentTranslator(BaseTranslator):
             'ProjectId': 0
         }
         res = sign_tencent(secret_id, secret_key, region, params, 'TextTranslateBatch')
-        response = requests.post(res['url'], json=params, timeout=10, headers=res['headers'])
+        response = self.session.post(res['url'], json=params, timeout=10, headers=res['headers'])
         result = response.json()
         if 'Response' not in result:
             raise Exception(get_lang('no_response_from', {'0': 'Tencent'}))
@@ -37,7 +37,7 @@ class VolcengineTranslator(BaseTranslator):
             "SourceLanguage": self.from_lang,
             "TargetLanguage": self.to_lang,
         }
-        response = request(access_key_id, access_key_secret, region, json.dumps(body))
+        response = request(access_key_id, access_key_secret, region, json.dumps(body), self.session)
         if not response.text:
             raise Exception(get_lang('response_is_empty', {'0': 'volcengine'}))
         result = response.json()
@@ -80,7 +80,7 @@ def hmac_sha256(key: bytes, content: str):
 def hash_sha256(content: str):
     return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-def request(access_key_id, access_key_secret, region, body):
+def request(access_key_id, access_key_secret, region, body, session=requests):
     service = "translate"
     date = datetime.datetime.utcnow()
     method = 'POST'
@@ -177,7 +177,7 @@ def request(access_key_id, access_key_secret, region, body):
     header = {**header, **sign_result}
     # header = {**header, **{"X-Security-Token": SessionToken}}
     # 第六步：将 Signature 签名写入 HTTP Header 中，并发送 HTTP 请求。
-    r = requests.request(method=method,
+    r = session.request(method=method,
                         url="https://{}{}".format(request_param["host"], request_param["path"]),
                         headers=header,
                         params=request_param["query"],
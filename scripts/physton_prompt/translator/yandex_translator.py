@@ -1,5 +1,4 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
-import requests
 from scripts.physton_prompt.get_lang import get_lang
 
 
@@ -32,7 +31,7 @@ class YandexTranslator(BaseTranslator):
             "Content-Type": "application/json",
             "Authorization": f"Api-Key {api_key}"
         }
-        response = requests.post('https://translate.api.cloud.yandex.net/translate/v2/translate',
+        response = self.session.post('https://translate.api.cloud.yandex.net/translate/v2/translate',
                                  json=body,
                                  headers=headers
                                  )
@@ -1,5 +1,4 @@
 from scripts.physton_prompt.translator.base_tanslator import BaseTranslator
-import requests
 import hashlib
 import random
 import time
@@ -50,7 +49,7 @@ class YoudaoTranslator(BaseTranslator):
             'sign': sign
         }
         headers = {"Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"}
-        response = requests.post(url, params=params, timeout=10, headers=headers)
+        response = self.session.post(url, params=params, timeout=10, headers=headers)
         result = response.json()
         if 'errorCode' not in result:
             raise Exception(get_lang('no_response_from', {'0': 'Youdao'}))
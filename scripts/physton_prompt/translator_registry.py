@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import OrderedDict
+from scripts.physton_prompt.translator.alibaba_translator import AlibabaTranslator
+from scripts.physton_prompt.translator.amazon_translator import AmazonTranslator
+from scripts.physton_prompt.translator.baidu_translator import BaiduTranslator
+from scripts.physton_prompt.translator.deepl_translator import DeeplTranslator
+from scripts.physton_prompt.translator.google_tanslator import GoogleTranslator
+from scripts.physton_prompt.translator.microsoft_translator import MicrosoftTranslator
+from scripts.physton_prompt.translator.openai_translator import OpenaiTranslator
+from scripts.physton_prompt.translator.tencent_translator import TencentTranslator
+from scripts.physton_prompt.translator.translators_translator import TranslatorsTranslator
+from scripts.physton_prompt.translator.yandex_translator import YandexTranslator
+from scripts.physton_prompt.translator.youdao_translator import YoudaoTranslator
+from scripts.physton_prompt.translator.mymemory_translator import MyMemoryTranslator
+from scripts.physton_prompt.translator.niutrans_translator import NiutransTranslator
+from scripts.physton_prompt.translator.caiyun_translator import CaiyunTranslator
+from scripts.physton_prompt.translator.volcengine_translator import VolcengineTranslator
+from scripts.physton_prompt.translator.iflytekV1_translator import IflytekV1Translator
+from scripts.physton_prompt.translator.iflytekV2_translator import IflytekV2Translator
+from scripts.physton_prompt.translator.mbart50_translator import MBart50Translator
+
+# API 的 key -> 翻译器类，translate_apis.json 中 type 为 translators 的 API 使用 TranslatorsTranslator
+translator_classes = {
+    'google': GoogleTranslator,
+    'microsoft': MicrosoftTranslator,
+    'openai': OpenaiTranslator,
+    'amazon': AmazonTranslator,
+    'deepl': DeeplTranslator,
+    'baidu': BaiduTranslator,
+    'alibaba': AlibabaTranslator,
+    'yandex': YandexTranslator,
+    'youdao': YoudaoTranslator,
+    'tencent': TencentTranslator,
+    'myMemory_free': MyMemoryTranslator,
+    'myMemory': MyMemoryTranslator,
+    'niutrans': NiutransTranslator,
+    'caiyun': CaiyunTranslator,
+    'volcengine': VolcengineTranslator,
+    'iflytekV1': IflytekV1Translator,
+    'iflytekV2': IflytekV2Translator,
+    'mbart50': MBart50Translator,
+}
+
+
+class TranslatorRegistry:
+    """
+    翻译器池：同一个 API、语言和配置只创建一个翻译器，之后的翻译都复用它，连同它的 HTTP 连接和 SDK 客户端。
+    翻译器会被多个请求同时使用，所以源语言和目标语言也是键的一部分，创建后不再修改。
+    超过 max_entries 个时关闭最久没有使用的；保存 translate_api.<key> 的配置时用 invalidate 关闭这个 API 的所有翻译器；
+    translate_apis.json 重新加载后旧的翻译器不再使用。
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        # (API, 源语言, 目标语言, 配置) -> 翻译器
+        self.entries = OrderedDict()
+        self.created = 0
+        self.hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def create(api_item):
+        """
+        创建 api_item 对应的翻译器，不支持时返回 None
+        """
+        api = api_item['key']
+        if api in translator_classes:
+            return translator_classes[api]()
+        if api_item.get('type', None) == 'translators':
+            translator = TranslatorsTranslator(api)
+            translator.set_translator(api_item['translator'])
+            return translator
+        return None
+
+    @staticmethod
+    def config_key(api_config):
+        # 包括密钥，更换密钥后使用新的翻译器
+        return tuple(sorted((key, repr(value)) for key, value in (api_config or {}).items()))
+
+    def get(self, api_item, from_lang, to_lang, api_config):
+        """
+        返回已经设置好语言和配置的翻译器，API 不支持时返回 None，语言不支持时抛出异常
+        """
+        key = (api_item['key'], from_lang, to_lang, self.config_key(api_config))
+        with self.lock:
+            translator = self.entries.get(key)
+            if translator is not None:
+                if translator.api_item is api_item:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return translator
+                # translate_apis.json 已经重新加载
+                del self.entries[key]
+        if translator is not None:
+            translator.close()
+
+        translator = self.create(api_item)
+        if translator is None:
+            return None
+        translator.set_from_lang(from_lang)
+        translator.set_to_lang(to_lang)
+        translator.set_api_config(dict(api_config or {}))
+
+        evicted = []
+        with self.lock:
+            existing = self.entries.get(key)
+            if existing is not None and existing.api_item is api_item:
+                # 其他线程已经创建了同样的翻译器
+                evicted.append(translator)
+                translator = existing
+            else:
+                self.entries[key] = translator
+                self.created += 1
+                while self.max_entries and len(self.entries) > self.max_entries:
+                    evicted.append(self.entries.popitem(last=False)[1])
+                    self.evictions += 1
+        for item in evicted:
+            item.close()
+        return translator
+
+    def invalidate(self, api=None):
+        """
+        关闭并移除 api 的所有翻译器，api 为 None 时移除全部
+        """
+        with self.lock:
+            keys = [key for key in self.entries if api is None or key[0] == api]
+            removed = [self.entries.pop(key) for key in keys]
+            self.invalidations += len(removed)
+        for translator in removed:
+            translator.close()
+        return len(removed)
+
+    def invalidate_config(self, data_key):
+        """
+        保存设置时调用，data_key 是 translate_api.<key> 时移除这个 API 的翻译器
+        """
+        start = 'translate_api.'
+        if isinstance(data_key, str) and data_key.startswith(start):
+            self.invalidate(data_key[len(start):])
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'apis': sorted(set(key[0] for key in self.entries)),
+                'created': self.created,
+                'hits': self.hits,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'max_entries': self.max_entries,
+            }
+
+
+translator_registry = TranslatorRegistry(int(os.environ.get('PHYSTON_PROMPT_TRANSLATOR_POOL_SIZE', '64')))
@@ -0,0 +1,101 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import uuid
+import random
+
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.history import History
+
+count = 10000
+type = 'txt2img'
+
+
+def gen_item(i):
+    return {
+        'id': str(uuid.uuid1()),
+        'time': int(time.time()),
+        'name': '',
+        'tags': [{'value': f'tag{i % 300}', 'localValue': ''}],
+        'prompt': f'tag{i % 300}, 1girl',
+    }
+
+
+def bench(name, func, times=1):
+    start = time.perf_counter()
+    for _ in range(times):
+        func()
+    elapsed = (time.perf_counter() - start) / times
+    print(f"  {name:<22} {elapsed * 1000:>10.3f} ms")
+
+
+def old_get_histories(hi):
+    # 旧实现：每条历史记录线性扫描收藏列表，O(n·m)
+    for history in hi.histories[type].items:
+        is_favorite = False
+        for favorite in hi.favorites[type].items:
+            if favorite['id'] == history['id']:
+                is_favorite = True
+                break
+        history['is_favorite'] = is_favorite
+    for history in hi.histories[type].items:
+        history.pop('is_favorite', None)
+
+
+try:
+    histories = [gen_item(i) for i in range(count)]
+    favorites = [dict(item) for item in histories]
+    random.shuffle(favorites)
+    Storage.set('history.' + type, histories)
+    Storage.set('favorite.' + type, favorites)
+    History.max = count
+
+    hi = History()
+    ids = [item['id'] for item in histories]
+    print(f"{count} histories, {count} favorites:")
+    bench('get_histories (old)', lambda: old_get_histories(hi))
+    bench('get_histories', lambda: hi.get_histories(type), 10)
+    bench('is_favorite x1000', lambda: [hi.is_favorite(type, id) for id in random.sample(ids, 1000)], 10)
+    # 修改操作包含写入文件的时间
+    bench('move_up_favorite', lambda: hi.move_up_favorite(type, random.choice(ids)), 5)
+    bench('set_history_name', lambda: hi.set_history_name(type, random.choice(ids), 'name'), 5)
+    bench('remove_history', lambda: hi.remove_history(type, ids.pop()), 5)
+
+    assert all('is_favorite' not in item for item in hi.histories[type].items)
+
+    # 超过 max 的历史记录进入冷数据分段，push_history 的开销不随保留数量增长
+    History.max = 100
+    History.retention = 50000
+    Storage.set('history.' + type, [])
+    hi = History()
+    print(f"push_history with retention {History.retention}:")
+    pushed = 0
+    for total in [1000, 10000, 50000]:
+        pushes = total - pushed
+        pushed = total
+        start = time.perf_counter()
+        for i in range(pushes):
+            hi.push_history(type, [], f'tag{i % 300}, 1girl')
+        elapsed = time.perf_counter() - start
+        print(f"  {total:>6} entries        {elapsed / pushes * 1000:>10.3f} ms/push")
+    page, cursor = hi.get_histories_page(type, 100)
+    for _ in range(100):
+        page, cursor = hi.get_histories_page(type, 100, cursor)
+    bench('page (depth 10k)', lambda: hi.get_histories_page(type, 100, cursor), 10)
+
+    # 第一次搜索时从冷数据和热数据建立索引
+    print(f"search with {pushed} entries:")
+    bench('search (build index)', lambda: hi.search_histories(type, 'tag123'))
+    bench('search "tag123"', lambda: hi.search_histories(type, 'tag123'), 10)
+    bench('search "tag12"', lambda: hi.search_histories(type, 'tag12'), 10)
+    bench('search "1girl tag1"', lambda: hi.search_histories(type, '1girl tag1'), 10)
+    bench('search "tag1 1girl"', lambda: hi.search_histories(type, 'tag1 1girl'), 10)
+    # 多个词的得分与词的顺序无关
+    assert hi.search_histories(type, '1girl tag1') == hi.search_histories(type, 'tag1 1girl')
+finally:
+    shutil.rmtree(storage_path)
@@ -0,0 +1,77 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import uuid
+import random
+
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.history import History
+from scripts.physton_prompt.storage_engine.read_cache import read_cache
+
+count = 10000
+type = 'txt2img'
+vocabulary = [(f'tag {i}', f'标签{i}') for i in range(500)]
+
+
+def gen_tag(value, local_value):
+    # 与前端 tagMixin._appendTag/_setTag 生成的结构一致
+    return {
+        'id': str(int(time.time() * 1000)) + str(random.randrange(1000000)),
+        'value': value,
+        'localValue': local_value,
+        'disabled': False,
+        'type': 'text',
+        'originalValue': value,
+        'weightNum': 1,
+        'incWeight': 0,
+        'decWeight': 0,
+        'isLora': False,
+        'isLyco': False,
+        'isEmbedding': False,
+    }
+
+
+def gen_item():
+    tags = [gen_tag(*random.choice(vocabulary)) for _ in range(random.randint(5, 20))]
+    return {
+        'id': str(uuid.uuid1()),
+        'time': int(time.time()),
+        'name': '',
+        'tags': tags,
+        'prompt': ', '.join(tag['value'] for tag in tags),
+    }
+
+
+def measure(name):
+    History.instances.clear()
+    read_cache.clear()
+    start = time.perf_counter()
+    hi = History()
+    # History 在第一次用到某个类型时才读取存储
+    hi.histories[type]
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(os.path.join(Storage.get_path(), f'history.{type}.json'))
+    print(f"  {name:<10} file {size / 1024 / 1024:>8.2f} MB, load {elapsed * 1000:>8.1f} ms")
+    return hi
+
+
+try:
+    History.max = count
+    histories = [gen_item() for _ in range(count)]
+    Storage.set('history.' + type, histories)
+    print(f"{count} histories:")
+    measure('old')
+
+    # 任意一次写入都会把旧格式转换成紧凑格式
+    History.compact = True
+    hi = History()
+    hi.set_history_name(type, histories[0]['id'], 'name')
+    hi = measure('compact')
+    assert hi.get_histories(type)[1]['tags'] == histories[1]['tags']
+finally:
+    shutil.rmtree(storage_path)
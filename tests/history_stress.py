@@ -0,0 +1,111 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import random
+import threading
+import traceback
+
+from scripts.physton_prompt.history import History
+from scripts.physton_prompt.history_segments import HistorySegments
+
+type = 'txt2img'
+readers = 8
+writers = 4
+duration = 5
+errors = []
+counts = {'reads': 0, 'writes': 0}
+
+
+def check_snapshot(snapshot):
+    # 快照的索引必须与列表一致
+    assert len(snapshot.indexes) == len(snapshot.items)
+    for id, index in snapshot.indexes.items():
+        assert snapshot.items[index]['id'] == id
+
+
+def reader(hi, stop):
+    while not stop.is_set():
+        try:
+            check_snapshot(hi.histories[type])
+            check_snapshot(hi.favorites[type])
+            histories = hi.get_histories(type)
+            assert len(histories) <= History.max
+            assert len(set(item['id'] for item in histories)) == len(histories)
+            ids = []
+            cursor = None
+            while True:
+                page, cursor = hi.get_histories_page(type, 37, cursor, ['id', 'time'])
+                ids += [item['id'] for item in page]
+                if not cursor:
+                    break
+            assert len(set(ids)) == len(ids), 'duplicated ids across pages'
+            favorites = hi.get_favorites(type)
+            for favorite in favorites[:10]:
+                hi.is_favorite(type, favorite['id'])
+            hi.search_histories(type, 'tag1')
+            counts['reads'] += 1
+        except Exception:
+            errors.append(traceback.format_exc())
+            stop.set()
+
+
+def writer(hi, stop):
+    while not stop.is_set():
+        try:
+            histories = hi.get_histories(type)
+            favorites = hi.get_favorites(type)
+            action = random.random()
+            if action < 0.4 or not histories:
+                hi.push_history(type, [{'value': f'tag{random.randrange(100)}'}], 'prompt')
+            elif action < 0.5:
+                hi.push_favorite(type, [{'value': 'favorite'}], 'favorite')
+            elif action < 0.6:
+                hi.dofavorite(type, random.choice(histories)['id'])
+            elif action < 0.7 and favorites:
+                hi.unfavorite(type, random.choice(favorites)['id'])
+            elif action < 0.8 and favorites:
+                hi.move_up_favorite(type, random.choice(favorites)['id'])
+            elif action < 0.85 and favorites:
+                hi.move_down_favorite(type, random.choice(favorites)['id'])
+            elif action < 0.95:
+                hi.set_history(type, random.choice(histories)['id'], [{'value': 'edited'}], 'edited', 'edited')
+            else:
+                hi.remove_history(type, random.choice(histories)['id'])
+            counts['writes'] += 1
+        except Exception:
+            errors.append(traceback.format_exc())
+            stop.set()
+
+
+try:
+    History.max = 50
+    History.retention = 300
+    HistorySegments.segment_size = 40
+    hi = History()
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(hi, stop)) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(hi, stop)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"{readers} readers, {writers} writers, {duration}s: {counts['reads']} reads, {counts['writes']} writes")
+    for error in errors[:3]:
+        print(error)
+    assert not errors, f'{len(errors)} errors'
+
+    # 重新加载后与内存中的数据一致
+    reloaded = History()
+    assert reloaded.get_histories(type) == hi.get_histories(type)
+    assert reloaded.get_favorites(type) == hi.get_favorites(type)
+    print("invariants: ok")
+finally:
+    shutil.rmtree(storage_path)
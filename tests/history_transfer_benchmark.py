@@ -0,0 +1,66 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import json
+import time
+import uuid
+
+from scripts.physton_prompt.history import History
+from scripts.physton_prompt.history_transfer import export_lines, HistoryImporter
+
+count = 100000
+batch_size = 1000
+type = 'txt2img'
+
+
+def gen_line(i, now):
+    # 每 10 条中 1 条收藏
+    kind = 'favorite' if i % 10 == 0 else 'history'
+    item = {
+        'id': str(uuid.uuid4()),
+        'time': now - count + i,
+        'name': '',
+        'tags': [{'value': f'tag{i % 500}', 'localValue': ''}],
+        'prompt': f'tag{i % 500}, 1girl',
+    }
+    return json.dumps({'kind': kind, 'type': type, 'item': item}) + '\n'
+
+
+def run_import(hi, filename):
+    importer = HistoryImporter(hi, batch_size)
+    start = time.perf_counter()
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            importer.feed(chunk)
+    stats = importer.finish()
+    return stats, time.perf_counter() - start
+
+
+try:
+    History.retention = count * 2
+    filename = os.path.join(storage_path, 'import.ndjson')
+    now = int(time.time())
+    with open(filename, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(gen_line(i, now))
+
+    hi = History()
+    stats, elapsed = run_import(hi, filename)
+    print(f"import {count} items in batches of {batch_size}: {elapsed:.2f}s {stats}")
+    stats, elapsed = run_import(hi, filename)
+    print(f"import again (all duplicates):       {elapsed:.2f}s {stats}")
+    assert stats['imported'] == 0 and stats['skipped'] == count
+
+    start = time.perf_counter()
+    lines = sum(1 for _ in export_lines(hi))
+    print(f"export {lines} items: {time.perf_counter() - start:.2f}s")
+    assert lines == count
+finally:
+    shutil.rmtree(storage_path)
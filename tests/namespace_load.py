@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import random
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.physton_prompt.storage import Storage
+from scripts.physton_prompt.storage_engine.read_cache import read_cache
+from scripts.physton_prompt.history import History
+
+users = 1000
+requests = 5000
+workers = 16
+
+
+def simulate_request(index):
+    # 模拟一次请求：路由根据请求头设置命名空间，然后读写该用户的数据
+    user = f'user{random.randrange(users)}'
+    with Storage.use_namespace(user):
+        start = time.perf_counter()
+        hi = History.get_instance()
+        if index % 3 == 0:
+            hi.push_history('txt2img', [{'value': user}], user)
+            Storage.set('languageCode', user)
+        else:
+            hi.get_histories('txt2img')
+            Storage.get('languageCode')
+        return time.perf_counter() - start
+
+
+try:
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = sorted(executor.map(simulate_request, range(requests)))
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{requests} requests from {users} users in {elapsed:.2f}s ({requests / elapsed:.0f} req/s)")
+    print(f"latency p50: {latencies[len(latencies) // 2] * 1000:.2f} ms, p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"history instances: {len(History.instances)} (max {History.max_instances}), storage engines: {len(Storage.namespace_engines)} (max {Storage.max_namespace_engines})")
+    print(f"memory current: {current / 1024 / 1024:.1f} MB, peak: {peak / 1024 / 1024:.1f} MB")
+
+    # 每个用户只能看到自己的数据
+    for i in range(0, users, 97):
+        user = f'user{i}'
+        with Storage.use_namespace(user):
+            for item in History.get_instance().get_histories('txt2img'):
+                assert item['prompt'] == user
+            assert Storage.get('languageCode') in [None, user]
+    print("isolation: ok")
+
+    # 请求还在使用的实例被淘汰后，同一个命名空间的下一个请求要拿到同一个实例，不能各自覆盖对方的写入
+    with Storage.use_namespace('holder'):
+        held = History.get_instance()
+        for i in range(History.max_instances * 2):
+            History.get_instance(f'churn{i}')
+        assert 'holder' not in History.instances
+        assert History.get_instance() is held
+        held.push_history('txt2img', [], 'held')
+        for i in range(History.max_instances * 2):
+            History.get_instance(f'churn{i}')
+        History.get_instance().push_history('txt2img', [], 'again')
+        assert [item['prompt'] for item in held.get_histories('txt2img')] == ['held', 'again']
+    print("evicted instance in use: ok")
+
+    # 打开页面时每个用户都会批量读取设置，读取线程池和延迟合并写入的线程都不能随命名空间数量增长
+    keys = [f'setting{i}' for i in range(42)]
+    threads = threading.active_count()
+    for write_behind in [0, 50]:
+        Storage.set_engine('file', write_behind)
+        Storage.max_namespace_engines = 64
+        for i in range(200):
+            with Storage.use_namespace(f'boot{i}'):
+                Storage.set_many({key: {'value': i} for key in keys})
+                read_cache.clear()
+                datas = Storage.get_many(keys)
+                assert all(data == {'value': i} for data in datas.values())
+        Storage.flush()
+        print(f"get_many in 200 namespaces (write_behind {write_behind}ms): {threading.active_count()} threads")
+        # 读取线程池最多 8 个线程，所有命名空间共用一个延迟合并写入的线程
+        assert threading.active_count() <= threads + 8 + 1
+    Storage.set_engine('file', 0)
+    assert threading.active_count() <= threads + 8
+finally:
+    shutil.rmtree(storage_path)
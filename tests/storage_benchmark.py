@@ -0,0 +1,71 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import shutil
+import tempfile
+
+from scripts.physton_prompt.storage_engine.file_engine import FileStorageEngine
+from scripts.physton_prompt.storage_engine.sqlite_engine import SqliteStorageEngine
+from scripts.physton_prompt.storage_engine.read_cache import read_cache
+
+keys = 200
+rounds = 5
+list_items = 500
+# App.vue 启动时一次读取的 key 数量
+boot_keys = [f'boot{i}' for i in range(42)]
+item = {'id': 'a3f1e0c2', 'name': '', 'prompt': '1girl, solo, long hair', 'tags': [{'value': '1girl', 'localValue': '1女孩'}]}
+
+
+def bench(name, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<14} {count / elapsed:>12.0f} ops/s")
+
+
+def bench_engine(engine):
+    print(f"{engine.name} {getattr(engine, 'list_mode', '')}:")
+    bench('set', lambda: [engine.set(f'key{i}', {'value': i}) for _ in range(rounds) for i in range(keys)], keys * rounds)
+    bench('get', lambda: [engine.get(f'key{i}') for _ in range(rounds) for i in range(keys)], keys * rounds)
+    bench('list_push', lambda: [engine.list_push('list', item) for _ in range(list_items)], list_items)
+    bench('list_get', lambda: [engine.list_get('list', i) for i in range(list_items)], list_items)
+    bench('list_shift', lambda: [engine.list_shift('list') for _ in range(list_items)], list_items)
+    boot_datas = {key: True for key in boot_keys[::2]}
+    bench('boot set', lambda: [engine.set(key, data) for _ in range(rounds) for key, data in boot_datas.items()],
+          len(boot_datas) * rounds)
+    bench('boot set_many', lambda: [engine.set_many(boot_datas) for _ in range(rounds)], len(boot_datas) * rounds)
+    # 每轮读写所有 boot key，ops 按 key 计
+    boot_reads = len(boot_keys) * rounds * 10
+    bench('boot get', lambda: [{key: engine.get(key) for key in boot_keys} for _ in range(rounds * 10)], boot_reads)
+    bench('boot get_many', lambda: [engine.get_many(boot_keys) for _ in range(rounds * 10)], boot_reads)
+    bench('cold get', lambda: [(read_cache.clear(), {key: engine.get(key) for key in boot_keys}) for _ in range(rounds * 10)],
+          boot_reads)
+    bench('cold get_many', lambda: [(read_cache.clear(), engine.get_many(boot_keys)) for _ in range(rounds * 10)], boot_reads)
+
+
+for create_engine in [
+    lambda path: FileStorageEngine(path, 'json'),
+    lambda path: FileStorageEngine(path, 'journal'),
+    lambda path: SqliteStorageEngine(path),
+]:
+    path = tempfile.mkdtemp()
+    try:
+        bench_engine(create_engine(path))
+    finally:
+        shutil.rmtree(path)
+
+# 从 json 文件迁移
+path = tempfile.mkdtemp()
+try:
+    file_engine = FileStorageEngine(path)
+    for i in range(keys):
+        file_engine.set(f'key{i}', {'value': i})
+    file_engine.set('list', [item] * list_items)
+    start = time.perf_counter()
+    sqlite_engine = SqliteStorageEngine(path)
+    print(f"migrate {keys + 1} keys: {(time.perf_counter() - start) * 1000:.1f} ms")
+    assert sqlite_engine.get('key1') == {'value': 1}
+    assert len(sqlite_engine.get('list')) == list_items
+finally:
+    shutil.rmtree(path)
@@ -0,0 +1,64 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import shutil
+import tempfile
+import threading
+import multiprocessing
+
+from scripts.physton_prompt.storage_engine.file_engine import FileStorageEngine
+
+processes = 4
+threads = 8
+pushes = 25
+key = 'stress'
+
+
+def push_worker(path, worker_id, latencies):
+    engine = FileStorageEngine(path)
+    for i in range(pushes):
+        start = time.perf_counter()
+        engine.list_push(key, f'{worker_id}-{i}')
+        latencies.append(time.perf_counter() - start)
+
+
+def process_worker(path, process_id, queue):
+    latencies = []
+    workers = []
+    for thread_id in range(threads):
+        worker = threading.Thread(target=push_worker, args=(path, f'{process_id}-{thread_id}', latencies))
+        workers.append(worker)
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(latencies)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+if __name__ == '__main__':
+    path = tempfile.mkdtemp()
+    try:
+        queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=process_worker, args=(path, i, queue)) for i in range(processes)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        latencies = []
+        for worker in workers:
+            latencies += queue.get()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        expected = processes * threads * pushes
+        items = FileStorageEngine(path).get(key)
+        print(f"{processes} processes x {threads} threads x {pushes} list_push in {elapsed:.2f}s")
+        print(f"latency p50: {percentile(latencies, 50) * 1000:.2f} ms, p99: {percentile(latencies, 99) * 1000:.2f} ms, max: {max(latencies) * 1000:.2f} ms")
+        print(f"items: {len(items)}, expected: {expected}, lost updates: {expected - len(set(items))}")
+    finally:
+        shutil.rmtree(path)
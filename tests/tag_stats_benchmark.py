@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import random
+
+from scripts.physton_prompt.history import History
+from scripts.physton_prompt.tag_stats import TagStats
+
+count = 20000
+pushes = 100
+type = 'txt2img'
+
+try:
+    History.retention = count * 2
+    hi = History()
+    now = int(time.time())
+    items = []
+    for i in range(count):
+        tags = [{'value': f'tag{random.randrange(2000)}', 'localValue': ''} for _ in range(20)]
+        items.append({'id': str(i), 'time': now - count + i, 'name': '', 'tags': tags, 'prompt': ''})
+    hi.import_histories(type, items)
+
+    start = time.perf_counter()
+    stats = hi.rebuild_tag_stats(type)
+    print(f"rebuild from {count} histories: {time.perf_counter() - start:.2f}s, {len(stats.tags)} tags")
+
+    start = time.perf_counter()
+    for i in range(pushes):
+        hi.push_history(type, [{'value': f'tag{random.randrange(2000)}'} for _ in range(20)], '')
+    print(f"push_history with stats: {(time.perf_counter() - start) / pushes * 1000:.2f}ms per push")
+
+    start = time.perf_counter()
+    top = hi.get_tag_stats(type, 50)
+    print(f"top 50: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    # 增量统计与重建结果一致
+    expected = {stat['tag']: stat['count'] for stat in hi.rebuild_tag_stats(type).top()}
+    assert {stat['tag']: stat['count'] for stat in hi.get_tag_stats(type)} == expected
+    assert TagStats.normalize('(Long Hair:1.2)') == 'long hair'
+    print("incremental == rebuild: ok")
+
+    # 统计延迟保存，flush 之后新的实例读到的与内存中的一致
+    for i in range(7):
+        hi.push_history(type, [{'value': 'flushed'}], '')
+    hi.flush_tag_stats()
+    assert {stat['tag']: stat['count'] for stat in History().get_tag_stats(type)} == \
+           {stat['tag']: stat['count'] for stat in hi.get_tag_stats(type)}
+    print("flush: ok")
+finally:
+    shutil.rmtree(storage_path)
@@ -0,0 +1,90 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import threading
+import hashlib
+
+from scripts.physton_prompt.translate_cache import TranslateCache
+
+batch = 10000
+rounds = 20
+
+
+def key(text):
+    return hashlib.md5(f'google.en_US.zh_CN.{text}.{{}}'.encode('utf-8')).hexdigest()
+
+
+tags = [f'tag {i}' for i in range(batch)]
+keys = [key(tag) for tag in tags]
+values = [f'标签 {i}' for i in range(batch)]
+
+# 与原来的 dict 比较查询开销
+caches = dict(zip(keys, values))
+start = time.perf_counter()
+for _ in range(rounds):
+    result = [caches[k] if k in caches else None for k in keys]
+print(f"dict:               {(time.perf_counter() - start) / rounds * 1000:.2f}ms per {batch}-tag batch")
+
+cache = TranslateCache(batch * 2)
+cache.set_many(zip(keys, values))
+start = time.perf_counter()
+for _ in range(rounds):
+    result = cache.get_many(keys)
+print(f"get_many:           {(time.perf_counter() - start) / rounds * 1000:.2f}ms per {batch}-tag batch")
+assert result == values
+
+start = time.perf_counter()
+for _ in range(rounds):
+    result = [cache.get(k) for k in keys]
+print(f"get:                {(time.perf_counter() - start) / rounds * 1000:.2f}ms per {batch}-tag batch")
+
+start = time.perf_counter()
+for _ in range(rounds):
+    result = [key(tag) for tag in tags]
+print(f"md5 cache keys:     {(time.perf_counter() - start) / rounds * 1000:.2f}ms per {batch}-tag batch")
+
+# 按条数淘汰
+cache = TranslateCache(batch // 2)
+cache.set_many(zip(keys, values))
+stats = cache.stats()
+assert stats['entries'] == batch // 2 and stats['evictions'] == batch - batch // 2
+assert cache.get(keys[0]) is None and cache.get(keys[-1]) == values[-1]
+
+# 按字节数淘汰
+cache = TranslateCache(0, 100 * 1024)
+cache.set_many(zip(keys, values))
+assert cache.stats()['bytes'] <= 100 * 1024
+print(f"bytes limit:        {cache.stats()}")
+
+# 过期
+cache = TranslateCache(batch, 0, 0.05)
+cache.set_many(zip(keys, values))
+time.sleep(0.1)
+assert cache.get_many(keys[:10]) == [None] * 10
+
+# 多线程读写
+cache = TranslateCache(batch // 2)
+errors = []
+
+
+def worker(offset):
+    try:
+        for i in range(rounds):
+            cache.set_many(zip(keys[offset::4], values[offset::4]))
+            for expected, value in zip(values[offset::4], cache.get_many(keys[offset::4])):
+                assert value is None or value == expected
+    except Exception as e:
+        errors.append(e)
+
+
+threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+stats = cache.stats()
+assert not errors
+assert stats['entries'] <= batch // 2
+assert stats['bytes'] == sum(entry[2] for entry in cache.entries.values())
+print(f"threads:            {stats}")
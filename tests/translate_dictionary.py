@@ -0,0 +1,36 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import random
+
+from scripts.physton_prompt.translate_dictionary import TranslateDictionary
+
+batch = 10000
+
+try:
+    dictionary = TranslateDictionary()
+    for lang in ['zh_CN', 'ja_JP', 'de_DE']:
+        start = time.perf_counter()
+        dictionary.lookup('en_US', lang, '1girl')
+        print(f"load {lang}: {(time.perf_counter() - start) * 1000:.0f}ms")
+    print(dictionary.stats()['languages'])
+
+    tags = list(dictionary.languages['zh_CN'][1].keys())
+    texts = [random.choice(tags).replace(' ', '_') if random.random() < 0.8 else f'unknown {i}' for i in range(batch)]
+    start = time.perf_counter()
+    results = dictionary.lookup_many('en_US', 'zh_CN', texts)
+    print(f"lookup {batch} tags: {(time.perf_counter() - start) * 1000:.2f}ms, {sum(1 for r in results if r is not None)} served locally")
+
+    # 反方向
+    assert dictionary.lookup('en_US', 'zh_CN', '1 girl') == '1女孩'
+    assert dictionary.lookup('zh_CN', 'en_US', '1女孩') == '1girl'
+    # 只支持英文和其他语言之间
+    assert dictionary.lookup('zh_CN', 'ja_JP', '1女孩') is None
+    print(dictionary.stats())
+finally:
+    shutil.rmtree(storage_path)
@@ -0,0 +1,82 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import json
+import random
+import hashlib
+import yaml
+
+from scripts.physton_prompt.get_translate_apis import get_translate_apis
+from scripts.physton_prompt.translate_key import cache_key, cache_scope
+
+# 用法：python tests/translate_key_replay.py [prompts.txt]
+# prompts.txt 每行一个提示词，没有时从 group_tags/default.yaml 生成，模拟用户输入时的各种写法
+sessions = 20
+prompts_per_session = 200
+random.seed(0)
+
+
+def old_cache_name(api, from_lang, to_lang, text, api_config):
+    cache_name = f'{api}.{from_lang}.{to_lang}.{text.strip()}.' + json.dumps(api_config)
+    return hashlib.md5(cache_name.encode('utf-8')).hexdigest()
+
+
+def variant(tag):
+    action = random.random()
+    if action < 0.2:
+        return tag.replace(' ', '_')
+    if action < 0.3:
+        return ' ' + tag + '  '
+    if action < 0.4:
+        return tag.replace(' ', '  ')
+    return tag
+
+
+def gen_prompts():
+    with open(os.path.join(os.path.dirname(__file__), '../group_tags/default.yaml'), 'r', encoding='utf8') as f:
+        data = yaml.safe_load(f)
+    tags = []
+    for item in data:
+        for group in item.get('groups', []):
+            tags += list((group.get('tags') or {}).keys())
+    tags = [str(tag) for tag in tags] + ['1girl', '1 girl', '2girls', '2 girls', '1boy', '1 boy']
+    # 常用的标签出现得更多
+    weights = [1 / (index + 1) for index in range(len(tags))]
+    for _ in range(sessions * prompts_per_session):
+        yield ','.join(variant(tag) for tag in random.choices(tags, weights, k=random.randint(5, 20)))
+
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], 'r', encoding='utf8') as f:
+        prompts = [line.strip() for line in f if line.strip()]
+else:
+    prompts = list(gen_prompts())
+
+api_item = [item for group in get_translate_apis()['apis'] for item in group['children'] if item['key'] == 'openai'][0]
+old_cache = set()
+new_cache = set()
+lookups = 0
+old_hits = 0
+new_hits = 0
+session_size = max(1, len(prompts) // sessions)
+for index, prompt in enumerate(prompts):
+    session = index // session_size
+    # 每个会话中前端传来的配置键顺序不同，每 5 个会话更换一次密钥
+    api_config = {'api_key': f'sk-{session // 5}', 'model': 'gpt-3.5-turbo'}
+    if session % 2:
+        api_config = dict(reversed(list(api_config.items())))
+    scope = cache_scope(api_item, api_config)
+    for text in prompt.split(','):
+        if not text.strip():
+            continue
+        lookups += 1
+        key = old_cache_name('openai', 'en_US', 'zh_CN', text, api_config)
+        old_hits += key in old_cache
+        old_cache.add(key)
+        key = cache_key(scope, 'en_US', 'zh_CN', text)
+        new_hits += key in new_cache
+        new_cache.add(key)
+
+print(f"{len(prompts)} prompts, {lookups} lookups")
+print(f"old keys: {old_hits / lookups:.1%} hit rate, {len(old_cache)} distinct keys")
+print(f"new keys: {new_hits / lookups:.1%} hit rate, {len(new_cache)} distinct keys")
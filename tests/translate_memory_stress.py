@@ -0,0 +1,65 @@
+import os
+import sys
+import shutil
+import tempfile
+storage_path = tempfile.mkdtemp()
+os.environ['PHYSTON_PROMPT_STORAGE_PATH'] = storage_path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import multiprocessing
+
+from scripts.physton_prompt.translate_memory import TranslateMemory
+
+processes = 4
+count = 5000
+batch = 100
+db_file = os.path.join(storage_path, TranslateMemory.db_name)
+
+
+def worker(index):
+    # 多个进程同时读写同一个数据库，模拟多个 webui 进程
+    memory = TranslateMemory(db_file, 0)
+    for start in range(0, count, batch):
+        texts = [f'tag {i}' for i in range(start, start + batch)]
+        memory.set_many('google', 'en_US', 'zh_CN', [(text, text.replace('tag', '标签')) for text in texts])
+        results = memory.get_many('google', 'en_US', 'zh_CN', texts)
+        assert results == [text.replace('tag', '标签') for text in texts]
+    memory.flush()
+    return memory.stats()['errors']
+
+
+try:
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        errors = pool.map(worker, range(processes))
+    print(f"{processes} processes x {count} writes and reads: {time.perf_counter() - start:.2f}s, errors {errors}")
+    assert sum(errors) == 0
+
+    memory = TranslateMemory(db_file, 0)
+    texts = [f'tag {i}' for i in range(count)]
+    start = time.perf_counter()
+    results = memory.get_many('google', 'en_US', 'zh_CN', texts)
+    print(f"get_many {count}: {(time.perf_counter() - start) * 1000:.2f}ms")
+    assert None not in results
+    assert memory.get('google', 'en_US', 'zh_CN', '  tag   1 ') == '标签 1'
+    assert memory.get('google', 'zh_CN', 'en_US', 'tag 1') is None
+
+    # 导出再导入到新的数据库
+    lines = list(memory.export_lines())
+    assert len(lines) == count
+    other = TranslateMemory(os.path.join(storage_path, 'other.sqlite3'), 0)
+    print(f"import: {other.import_lines([line.encode('utf-8') for line in lines] + [b'{bad json'])}")
+    assert other.get_many('google', 'en_US', 'zh_CN', texts) == results
+
+    # 压缩时保留最近使用的
+    time.sleep(0.01)
+    memory.get_many('google', 'en_US', 'zh_CN', texts[:10])
+    memory.flush()
+    before = os.path.getsize(db_file)
+    deleted = memory.compact(1000)
+    stats = memory.stats()
+    print(f"compact to 1000: deleted {deleted}, {stats['entries']} entries, {before} -> {stats['bytes']} bytes")
+    assert stats['entries'] == 900
+    assert None not in memory.get_many('google', 'en_US', 'zh_CN', texts[:10])
+finally:
+    shutil.rmtree(storage_path)
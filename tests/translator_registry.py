@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import threading
+import requests
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from scripts.physton_prompt.get_translate_apis import get_translate_api
+from scripts.physton_prompt.translator_registry import TranslatorRegistry
+
+rounds = 500
+api_config = {'api_key': 'test'}
+api_item = get_translate_api('google')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{server.server_port}/'
+
+# 原来每次翻译都新建翻译器，请求使用 requests.get，每次都要新建连接
+start = time.perf_counter()
+for _ in range(rounds):
+    requests.get(url, timeout=10)
+print(f"requests.get:     {(time.perf_counter() - start) / rounds * 1000:.3f}ms per request")
+
+registry = TranslatorRegistry()
+start = time.perf_counter()
+for _ in range(rounds):
+    translator = registry.get(api_item, 'en_US', 'zh_CN', api_config)
+    translator.session.get(url, timeout=10)
+print(f"registry session: {(time.perf_counter() - start) / rounds * 1000:.3f}ms per request")
+
+session = translator.session
+assert registry.get(api_item, 'en_US', 'zh_CN', api_config).session is session
+assert registry.get(api_item, 'en_US', 'ja_JP', api_config) is not translator
+assert registry.get(api_item, 'en_US', 'zh_CN', {'api_key': 'other'}) is not translator
+registry.invalidate_config('translate_api.google')
+assert registry.get(api_item, 'en_US', 'zh_CN', api_config) is not translator
+print(registry.stats())
+server.shutdown()